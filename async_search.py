@@ -0,0 +1,122 @@
+from substring_finder import KMP_algorithm, Text, Needles, findall
+from concurrent.futures import Executor, ProcessPoolExecutor
+from collections import namedtuple
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, \
+    Optional, Union
+import asyncio
+import os
+
+Document = namedtuple('Document', ['name', 'data'])
+SearchResult = namedtuple('SearchResult', ['name', 'matches'])
+
+_DONE = object()
+
+
+async def search_documents(documents: AsyncIterable[tuple],
+                           needle: Needles,
+                           engine: Callable = KMP_algorithm,
+                           overlapping: bool = True,
+                           concurrency: Optional[int] = None,
+                           executor: Optional[Executor] = None) \
+        -> AsyncIterator[SearchResult]:
+    """
+    Searches every (name, data) document of an async iterable on
+    a pool of workers and yields a SearchResult with all the matches
+    of each document as soon as its search completes.
+    At most concurrency documents are read but not yet consumed:
+    when the workers or the consumer fall behind, the next document
+    is not read from the source, so memory stays bounded. Reading
+    the next documents overlaps with the searches in flight.
+    Without an executor a process pool of concurrency workers is used
+    """
+    loop = asyncio.get_running_loop()
+    concurrency = concurrency or os.cpu_count() or 1
+    if concurrency < 1:
+        raise ValueError(f'Concurrency must be positive: {concurrency}')
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+    results = asyncio.Queue()
+    tasks = set()
+
+    async def search(name: str, data: Text):
+        try:
+            matches = await loop.run_in_executor(
+                executor, findall, data, needle, engine, overlapping)
+            results.put_nowait(SearchResult(name, matches))
+        except Exception as error:
+            slots.release()
+            results.put_nowait(error)
+
+    async def produce():
+        try:
+            async for name, data in documents:
+                await slots.acquire()
+                task = asyncio.create_task(search(name, data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except Exception as error:
+            results.put_nowait(error)
+        results.put_nowait(_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            result = await results.get()
+            if result is _DONE:
+                break
+            if isinstance(result, Exception):
+                raise result
+            yield result
+            slots.release()
+    finally:
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(producer, *tasks, return_exceptions=True)
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def read_files(paths: Iterable[Union[str, os.PathLike]],
+                     encoding: Optional[str] = None) \
+        -> AsyncIterator[Document]:
+    """
+    Documents with the contents of the files, read in a thread so that
+    the event loop is not blocked. Without an encoding the data is bytes
+    and the spans of the matches are byte offsets
+    """
+    loop = asyncio.get_running_loop()
+    for path in paths:
+        data = await loop.run_in_executor(None, _read_file, path, encoding)
+        yield Document(str(path), data)
+
+
+async def read_streams(streams: Iterable[tuple[str, asyncio.StreamReader]]) \
+        -> AsyncIterator[Document]:
+    """Documents with everything read from each stream until EOF"""
+    for name, stream in streams:
+        yield Document(name, await stream.read())
+
+
+async def read_queue(queue: asyncio.Queue) -> AsyncIterator[Document]:
+    """
+    Documents put into the queue, as (name, data), until None is put.
+    The queue stands in for a message broker
+    """
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        yield Document(*item)
+
+
+def _read_file(path: Union[str, os.PathLike], encoding: Optional[str]) \
+        -> Union[str, bytes]:
+    if encoding is None:
+        with open(path, mode='rb') as f:
+            return f.read()
+    with open(path, encoding=encoding) as f:
+        return f.read()
@@ -0,0 +1,251 @@
+from trie import Trie
+from array import array
+from mmap import mmap, ACCESS_READ
+from typing import Union, BinaryIO
+import struct
+import sys
+import os
+
+_MAGIC = b'SFAC'
+_VERSION = 2
+_HEADER = struct.Struct('<4sHBxQQQQ')
+_ALIGNMENT = 8
+_MAX_ATTEMPTS = 64
+
+
+class CompactAutomaton:
+    """
+    Aho-Corasick automaton flattened from a Trie into typed arrays.
+    States are numbered densely in BFS order (0 is the root) and
+    characters are mapped to dense columns (0 is any character outside
+    the needles). The goto edges are packed into shared slot arrays by
+    row displacement: the edge of state s by column c is in the slot
+    base[s] + c when check[slot] == s, and leads to next[slot].
+    A missing edge follows fail[s], and the root has a full row, so
+    a lookup always ends there. Memory is O(states) rather than
+    O(states * alphabet) and the failure links followed by a search
+    are amortized O(1) per haystack character.
+    output[state] is the id of the longest needle ending in the state,
+    which is the state where that needle ends in the trie, or -1.
+    output_link[state] is the dictionary suffix link: the next shorter
+    needle state on the failure chain, or -1. word_ids maps the state
+    of every needle to the ids the Trie gave to its words, and is
+    stored in two arrays as well.
+    save writes the arrays to a versioned binary file and load maps
+    them back with mmap, so a loaded automaton searches straight from
+    the page cache without creating an object per state
+    """
+
+    def __init__(self, trie: Trie):
+        self.columns = {char: i for i, char
+                        in enumerate(sorted(trie.alphabet), 1)}
+        self.width = len(self.columns) + 1
+        nodes = [trie.root]
+        numbers = {id(trie.root): 0}
+        for node in nodes:
+            for child in node.children.values():
+                numbers[id(child)] = len(nodes)
+                nodes.append(child)
+        self.base = array('i', [0]) * len(nodes)
+        self.check = array('i')
+        self.next = array('i')
+        self.fail = array('i', [0]) * len(nodes)
+        self.depth = array('i', [0]) * len(nodes)
+        self.output = array('i', [-1]) * len(nodes)
+        self.output_link = array('i', [-1]) * len(nodes)
+        self.word_ids = MappedWordIds(array('I', [0]), array('I'))
+        self.binary = any(isinstance(e, int) for e in trie.alphabet)
+        self._build(nodes, numbers)
+        self._pack(nodes, numbers)
+
+    def _build(self, nodes: list, numbers: dict):
+        for state, node in enumerate(nodes):
+            if state != 0:
+                self.output_link[state] = self.output[self.fail[state]]
+            self.word_ids.ids.extend(node.word_ids)
+            self.word_ids.offsets.append(len(self.word_ids.ids))
+            if node.word_ids:
+                self.output[state] = state
+            else:
+                self.output[state] = self.output_link[state]
+            for char, child in node.children.items():
+                child_state = numbers[id(child)]
+                self.depth[child_state] = self.depth[state] + 1
+                if state == 0:
+                    continue
+                fail = self.fail[state]
+                while fail != 0 and char not in nodes[fail].children:
+                    fail = self.fail[fail]
+                target = nodes[fail].children.get(char)
+                if target is not None:
+                    self.fail[child_state] = numbers[id(target)]
+
+    def _pack(self, nodes: list, numbers: dict):
+        """
+        First fit placement of the rows of goto edges into the slots,
+        widest rows first so that the narrow ones fill the gaps. A row
+        which does not fit into the first _MAX_ATTEMPTS gaps is put at
+        the end, which bounds the time of the packing
+        """
+        root_row = [0] * self.width
+        for char, child in nodes[0].children.items():
+            root_row[self.columns[char]] = numbers[id(child)]
+        self.check.extend([0] * self.width)
+        self.next.extend(root_row)
+        # used mirrors check >= 0, so that bytearray.find skips the
+        # occupied slots at C speed
+        used = bytearray(b'\1') * self.width
+        states = sorted(range(1, len(nodes)),
+                        key=lambda e: -len(nodes[e].children))
+        for state in states:
+            children = nodes[state].children
+            if not children:
+                break
+            row = sorted((self.columns[char], numbers[id(child)])
+                         for char, child in children.items())
+            first = row[0][0]
+            free = used.find(0, first)
+            attempts = 0
+            while free >= 0 and any(used[free - first + column]
+                                    for column, _ in row[1:]
+                                    if free - first + column < len(used)):
+                attempts += 1
+                free = used.find(0, free + 1) \
+                    if attempts < _MAX_ATTEMPTS else -1
+            base = (len(used) if free < 0 else free) - first
+            end = base + row[-1][0] + 1
+            if end > len(used):
+                used.extend(bytes(end - len(used)))
+                self.check.extend([-1] * (end - len(self.check)))
+                self.next.extend([0] * (end - len(self.next)))
+            for column, child_state in row:
+                used[base + column] = 1
+                self.check[base + column] = state
+                self.next[base + column] = child_state
+            self.base[state] = base
+        # every lookup base + column stays inside the slots
+        self.check.extend([-1] * self.width)
+        self.next.extend([0] * self.width)
+
+    def goto(self, state: int, char) -> int:
+        """State after reading the character, failure links followed"""
+        column = self.columns.get(char, 0)
+        while self.check[self.base[state] + column] != state:
+            state = self.fail[state]
+        return self.next[self.base[state] + column]
+
+    def __len__(self):
+        return len(self.fail)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the arrays and of the column mapping"""
+        arrays = (self.base, self.check, self.next, self.fail, self.depth,
+                  self.output, self.output_link, self.word_ids.offsets,
+                  self.word_ids.ids)
+        return sum(a.itemsize * len(a) for a in arrays) \
+            + sys.getsizeof(self.columns) \
+            + sum(map(sys.getsizeof, self.columns))
+
+    def save(self, file: Union[str, os.PathLike, BinaryIO]):
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, mode='wb') as f:
+                return self.save(f)
+        alphabet = sorted(self.columns, key=self.columns.get)
+        offsets, ids = self.word_ids.offsets, self.word_ids.ids
+        file.write(_HEADER.pack(_MAGIC, _VERSION, self.binary, len(self),
+                                len(self.check), len(alphabet), len(ids)))
+        sections = [array('I', [e if self.binary else ord(e)
+                                for e in alphabet]),
+                    self.base, self.check, self.next, self.fail, self.depth,
+                    self.output, self.output_link, offsets, ids]
+        position = _HEADER.size
+        for section in sections:
+            padding = -position % _ALIGNMENT
+            data = _to_little_endian(section).tobytes()
+            file.write(bytes(padding) + data)
+            position += padding + len(data)
+
+    @classmethod
+    def load(cls, file: Union[str, os.PathLike, BinaryIO]) \
+            -> 'CompactAutomaton':
+        """
+        Maps a file written by save. The automaton keeps the mapping
+        open for as long as it is alive
+        """
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, mode='rb') as f:
+                return cls.load(f)
+        data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        if len(data) < _HEADER.size:
+            raise ValueError('File does not contain an automaton')
+        magic, version, binary, states, slots, alphabet_size, \
+            id_count = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError('File does not contain an automaton')
+        if version != _VERSION:
+            raise ValueError(f'Unsupported automaton version: {version}')
+        width = alphabet_size + 1
+        view = memoryview(data)
+        position = _HEADER.size
+        sections = []
+        for code, length in [('I', alphabet_size), ('i', states),
+                             ('i', slots), ('i', slots), ('i', states),
+                             ('i', states), ('i', states), ('i', states),
+                             ('I', states + 1), ('I', id_count)]:
+            position += -position % _ALIGNMENT
+            size = length * struct.calcsize(code)
+            if position + size > len(data):
+                raise ValueError('Automaton file is truncated')
+            sections.append(_from_little_endian(
+                view[position:position + size].cast(code)))
+            position += size
+        alphabet, base, check, next_state, fail, depth, output, \
+            output_link, offsets, ids = sections
+        automaton = cls.__new__(cls)
+        automaton.columns = {e if binary else chr(e): i
+                             for i, e in enumerate(alphabet, 1)}
+        automaton.width = width
+        automaton.base = base
+        automaton.check = check
+        automaton.next = next_state
+        automaton.fail = fail
+        automaton.depth = depth
+        automaton.output = output
+        automaton.output_link = output_link
+        automaton.word_ids = MappedWordIds(offsets, ids)
+        automaton.binary = bool(binary)
+        automaton._data = data
+        return automaton
+
+
+class MappedWordIds:
+    """
+    word_ids of an automaton: the ids of the words ending in a state
+    are ids[offsets[state]:offsets[state + 1]]
+    """
+
+    def __init__(self, offsets, ids):
+        self.offsets = offsets
+        self.ids = ids
+
+    def __getitem__(self, state: int) -> tuple:
+        return tuple(self.ids[self.offsets[state]:self.offsets[state + 1]])
+
+    def get(self, state: int, default=None):
+        ids = self[state] if 0 <= state < len(self.offsets) - 1 else ()
+        return ids or default
+
+
+def _to_little_endian(values: array) -> array:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _from_little_endian(values: memoryview) -> Union[memoryview, array]:
+    if sys.byteorder == 'big':
+        values = array(values.format, values)
+        values.byteswap()
+    return values
@@ -0,0 +1,161 @@
+from substring_finder import ENGINES, AC_algorithm, BMH_algorithm, \
+    RK_algorithm, AC_batch_finditer, RK_batch_finditer, finditer
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_right
+from contextlib import nullcontext
+from itertools import repeat
+from typing import Iterator, Optional
+import argparse
+import sys
+import os
+
+# every occurrence of every needle, as (needle_id, start, end)
+_BATCH_SEARCHES = {
+    AC_algorithm: AC_batch_finditer,
+    RK_algorithm: RK_batch_finditer,
+}
+
+
+class NewlineIndex:
+    """
+    Offsets of all newlines of a text, found in one pass by str.find.
+    The line and the column of an offset are found by bisection,
+    so reporting a match does not rescan the text
+    """
+
+    def __init__(self, text: str):
+        self.newlines = []
+        position = text.find('\n')
+        while position >= 0:
+            self.newlines.append(position)
+            position = text.find('\n', position + 1)
+        self._length = len(text)
+
+    def position(self, offset: int) -> tuple[int, int]:
+        """1-based line and column of the character at the offset"""
+        line = bisect_right(self.newlines, offset - 1)
+        return line + 1, offset - self.line_start(line + 1) + 1
+
+    def line_start(self, line: int) -> int:
+        return 0 if line <= 1 else self.newlines[line - 2] + 1
+
+    def line_end(self, line: int) -> int:
+        """Offset of the newline which ends the line, or of the text end"""
+        if line - 1 < len(self.newlines):
+            return self.newlines[line - 1]
+        return self._length
+
+
+def search_file(path: str, needles: list[str], engine_name: str,
+                count_only: bool = False, first_only: bool = False,
+                encoding: str = 'utf-8') -> list[str]:
+    """Output lines of grep for one file"""
+    with open(path, encoding=encoding, errors='surrogateescape') as f:
+        text = f.read()
+    engine = ENGINES[engine_name]
+    if engine in _BATCH_SEARCHES:
+        matches = ((start, end) for _, start, end
+                   in _BATCH_SEARCHES[engine](text, needles))
+    else:
+        matches = finditer(text, needles[0], engine)
+    if count_only:
+        return [f'{path}:{sum(1 for _ in matches)}']
+    if first_only:
+        matches = (e for e in [next(matches, None)] if e is not None)
+    index = NewlineIndex(text)
+    output = []
+    for start, _ in matches:
+        line, column = index.position(start)
+        output.append(f'{path}:{line}:{column}:'
+                      f'{text[index.line_start(line):index.line_end(line)]}')
+    return output
+
+
+def iterate_files(paths: list[str]) -> Iterator[str]:
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, directories, files in os.walk(path):
+            directories.sort()
+            for name in sorted(files):
+                yield os.path.join(directory, name)
+
+
+def main(arguments: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m substring_finder',
+        description='Prints file:line:column:line for every occurrence '
+                    'of the patterns. Directories are searched recursively')
+    parser.add_argument('pattern', nargs='?',
+                        help='the pattern, unless -e is given')
+    parser.add_argument('paths', nargs='*', metavar='path')
+    parser.add_argument('-e', '--regexp', action='append', dest='patterns',
+                        metavar='PATTERN',
+                        help='pattern to search for, can be repeated; '
+                             'several patterns use the Aho-Corasick engine')
+    parser.add_argument('--engine', choices=sorted(ENGINES),
+                        help='default: BMH_algorithm for one pattern and '
+                             'AC_algorithm for several')
+    parser.add_argument('-c', '--count', action='store_true',
+                        help='print only the number of matches per file')
+    parser.add_argument('-m', '--first', action='store_true',
+                        help='print only the first match per file')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='files searched in parallel')
+    parser.add_argument('--encoding', default='utf-8')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.patterns:
+        patterns = arguments.patterns
+        paths = [arguments.pattern] + arguments.paths \
+            if arguments.pattern is not None else arguments.paths
+    elif arguments.pattern is not None:
+        patterns, paths = [arguments.pattern], arguments.paths
+    else:
+        parser.error('a pattern is required')
+    if not paths:
+        parser.error('at least one path is required')
+    engine = arguments.engine
+    if engine is None:
+        engine = AC_algorithm.__name__ if len(patterns) > 1 \
+            else BMH_algorithm.__name__
+    elif len(patterns) > 1 and ENGINES[engine] not in _BATCH_SEARCHES:
+        parser.error(f'{engine} searches for a single pattern')
+
+    files = iterate_files(paths)
+    options = (patterns, engine, arguments.count, arguments.first,
+               arguments.encoding)
+    found = False
+    failed = False
+    if hasattr(sys.stdout, 'reconfigure'):
+        # undecodable bytes of the files are written back as they were
+        sys.stdout.reconfigure(errors='surrogateescape')
+    with ProcessPoolExecutor(max_workers=arguments.jobs) \
+            if arguments.jobs > 1 else nullcontext() as executor:
+        search = executor.map if executor is not None else map
+        for output, error in search(_search_file, files, repeat(options)):
+            if error is not None:
+                print(error, file=sys.stderr)
+                failed = True
+                continue
+            if arguments.count:
+                found = found or not output[0].endswith(':0')
+            else:
+                found = found or bool(output)
+            for line in output:
+                print(line)
+    if failed:
+        return 2
+    return 0 if found else 1
+
+
+def _search_file(path: str, options: tuple) -> tuple[list[str], Optional[str]]:
+    try:
+        return search_file(path, *options), None
+    except OSError as error:
+        return [], f'{path}: {error.strerror}'
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+from typing import Callable
+from itertools import accumulate
+import string
+import random
+
+DISTRIBUTIONS = ('uniform', 'zipf')
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_BASE_ALPHABET = string.ascii_lowercase + string.ascii_uppercase \
+    + string.digits
+
+
+def make_alphabet(size: int) -> str:
+    """
+    ASCII letters and digits, continued with Cyrillic and further
+    code points when more characters are needed
+    """
+    if size < 1:
+        raise ValueError(f'Alphabet size must be positive: {size}')
+    if size <= len(_BASE_ALPHABET):
+        return _BASE_ALPHABET[:size]
+    return _BASE_ALPHABET + ''.join(
+        chr(0x410 + i) for i in range(size - len(_BASE_ALPHABET)))
+
+
+def generate_text(size: int, alphabet_size: int = 26,
+                  distribution: str = 'uniform', seed: int = 0) -> str:
+    """
+    Random text of size characters. With the zipf distribution
+    the k-th character of the alphabet has the weight 1 / k
+    """
+    return ''.join(_generate_chunks(size, alphabet_size, distribution, seed,
+                                    DEFAULT_CHUNK_SIZE))
+
+
+def write_text(path: str, size: int, alphabet_size: int = 26,
+               distribution: str = 'uniform', seed: int = 0,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """
+    generate_text written to a file chunk by chunk, for corpora
+    that should not be held in memory
+    """
+    with open(path, encoding='utf-8', mode='w') as f:
+        for chunk in _generate_chunks(size, alphabet_size, distribution,
+                                      seed, chunk_size):
+            f.write(chunk)
+
+
+def _generate_chunks(size: int, alphabet_size: int, distribution: str,
+                     seed: int, chunk_size: int):
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f'Unknown distribution: {distribution}')
+    alphabet = make_alphabet(alphabet_size)
+    weights = None
+    if distribution == 'zipf':
+        weights = list(accumulate(1 / k for k in range(1, alphabet_size + 1)))
+    generator = random.Random(seed)
+    for position in range(0, size, chunk_size):
+        yield ''.join(generator.choices(
+            alphabet, cum_weights=weights,
+            k=min(chunk_size, size - position)))
+
+
+def random_needle(haystack: str, length: int, seed: int = 0) -> str:
+    """Substring of the haystack at a random position"""
+    if not 0 <= length <= len(haystack):
+        raise ValueError(f'Needle length must be in [0, {len(haystack)}]')
+    start = random.Random(seed).randint(0, len(haystack) - length)
+    return haystack[start:start + length]
+
+
+def periodic_needle(length: int, period: int = 2) -> str:
+    return (make_alphabet(period) * (length // period + 1))[:length]
+
+
+def suffix_mismatch_case(size: int, length: int) -> tuple[str, str]:
+    """
+    Every alignment matches all but the first needle character and
+    the bad character shift is 1: the O(n * m) worst case of
+    BMH_algorithm
+    """
+    return 'a' * size, 'b' + 'a' * (length - 1)
+
+
+def prefix_mismatch_case(size: int, length: int) -> tuple[str, str]:
+    """
+    Every alignment matches all but the last needle character:
+    the O(n * m) worst case of brute_force
+    """
+    return 'a' * size, 'a' * (length - 1) + 'b'
+
+
+def periodic_case(size: int, length: int) -> tuple[str, str]:
+    """Periodic haystack and a needle which breaks the period at the end"""
+    return periodic_needle(size), periodic_needle(length - 1) + 'c'
+
+
+ADVERSARIAL_CASES: dict[str, Callable[[int, int], tuple[str, str]]] = {
+    'suffix mismatch': suffix_mismatch_case,
+    'prefix mismatch': prefix_mismatch_case,
+    'periodic': periodic_case,
+}
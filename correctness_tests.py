@@ -1,17 +1,37 @@
 import unittest
+import tempfile
+import mmap
+import io
+import importlib
+import sys
+import os
 import substring_finder
+from automaton import CompactAutomaton
+from incremental_automaton import IncrementalAutomaton
+from trie import Trie
+import streaming
+import parallel
+from suffix_array import SuffixArray, RangeMinimum
+import vectorized_finder
+import dispatcher
+import helpers
+import async_search
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import corpus
+import scaling
+import cli
+import regression
+from report import Reporter
+from contextlib import redirect_stdout
+
+# every engine of the Matcher registry, single and multi needle
+SUBSTRING_FINDERS = list(substring_finder.ENGINES.values())
 
 
 class Substring_search_tests(unittest.TestCase):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.substring_finders = [
-            substring_finder.brute_force,
-            substring_finder.KMP_algorithm,
-            substring_finder.z_function_finder,
-            substring_finder.BMH_algorithm,
-            substring_finder.AC_algorithm
-        ]
+    substring_finders = SUBSTRING_FINDERS + [
+        vectorized_finder.vectorized_finder]
 
     def test_no_substring(self):
         test_string = "asdfghjkl;"
@@ -37,6 +57,894 @@ class Substring_search_tests(unittest.TestCase):
         for func in self.substring_finders:
             self.assertEqual(func(test_string, test_substring), (4, 10))
 
+    def test_needle_at_the_end(self):
+        test_string = "asdfghjkl;"
+        test_substring = "l;"
+        for func in self.substring_finders:
+            self.assertEqual(func(test_string, test_substring), (8, 10))
+
+    def test_only_last_characters_match(self):
+        test_string = "xbc abc"
+        test_substring = "abc"
+        for func in self.substring_finders:
+            self.assertEqual(func(test_string, test_substring), (4, 7))
+
+    def test_dollar_sign_in_data(self):
+        test_string = "a$$b$b"
+        test_substring = "$b"
+        for func in self.substring_finders:
+            self.assertEqual(func(test_string, test_substring), (2, 4))
+
+    def test_one_character_needle(self):
+        test_string = "xa"
+        test_substring = "a"
+        for func in self.substring_finders:
+            self.assertEqual(func(test_string, test_substring), (1, 2))
+
+    def test_several_needles(self):
+        self.assertEqual(
+            substring_finder.AC_algorithm("aab", ["ab", "ba"]), (1, 3))
+        self.assertEqual(
+            substring_finder.AC_algorithm("abce", ["abcd", "bc"]), (1, 3))
+
+
+class Vectorized_finder_tests(unittest.TestCase):
+    def test_all_occurrences_across_blocks(self):
+        test_string = "Метаданные; данные, данн, данные"
+        for overlapping in [True, False]:
+            self.assertEqual(
+                list(vectorized_finder.vectorized_finditer(
+                    test_string, "данные", overlapping, block_size=3)),
+                substring_finder.findall(test_string, "данные",
+                                         overlapping=overlapping))
+        self.assertEqual(
+            list(vectorized_finder.vectorized_finditer(
+                "bbaaaab", "aa", overlapping=False, block_size=1)),
+            [(2, 4), (4, 6)])
+
+    def test_binary_haystack(self):
+        test_data = "Метаданные;".encode("utf-8")
+        self.assertEqual(
+            vectorized_finder.vectorized_finder(test_data,
+                                                "данные".encode("utf-8")),
+            (8, 20))
+        self.assertEqual(
+            vectorized_finder.vectorized_finder(memoryview(test_data),
+                                                b"\xd0\xb4"),
+            (8, 10))
+
+
+class Dispatcher_tests(unittest.TestCase):
+    def test_engine_choice(self):
+        big_text = "asdfghjkl;" * 1000
+        self.assertIs(dispatcher.choose_engine(big_text, "fgh"),
+                      vectorized_finder.vectorized_finder)
+        self.assertIs(dispatcher.choose_engine("asdfghjkl;", "fgh"),
+                      substring_finder.BMH_algorithm)
+        self.assertIs(dispatcher.choose_engine("asdfghjkl;", "fg"),
+                      substring_finder.KMP_algorithm)
+        self.assertIs(dispatcher.choose_engine("ab" * 100000, "ab" * 50),
+                      substring_finder.KMP_algorithm)
+        self.assertIs(dispatcher.choose_engine(big_text, ["fgh", "kl"]),
+                      substring_finder.AC_algorithm)
+
+    def test_find(self):
+        for test_string in ["Метаданные;", "Метаданные;" * 1000]:
+            self.assertEqual(dispatcher.find(test_string, "данные"), (4, 10))
+            self.assertEqual(dispatcher.find(test_string, "asde"), -1)
+
+    def test_big_binary_haystack(self):
+        haystack = "x" * 200000 + "данные"
+        self.assertEqual(dispatcher.find(haystack.encode("utf-8"), "данные"),
+                         (200000, 200012))
+        self.assertEqual(dispatcher.find(bytearray(b"x" * 200000 + b"ab"),
+                                         "ab"), (200000, 200002))
+
+    def test_periodic_needles(self):
+        self.assertTrue(dispatcher.is_periodic("abababab"))
+        self.assertTrue(dispatcher.is_periodic("aaaa"))
+        self.assertFalse(dispatcher.is_periodic("aaaaaaaaff"))
+
+    def test_config_overrides_thresholds(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dispatch.json")
+            with open(path, "w") as f:
+                f.write('{"vectorized_linear_factor": 1, '
+                        '"vectorized_quadratic_factor": 1}')
+            dispatch_config = dispatcher.load_config(path)
+        self.assertEqual(dispatch_config.vectorized_linear_factor, 1)
+        self.assertEqual(dispatch_config.short_needle,
+                         dispatcher.DEFAULT_CONFIG.short_needle)
+        self.assertIs(
+            dispatcher.choose_engine("asdfghjkl;", "fgh", dispatch_config),
+            vectorized_finder.vectorized_finder)
+
+
+class Binary_input_tests(unittest.TestCase):
+    substring_finders = SUBSTRING_FINDERS
+
+    def test_binary_haystacks(self):
+        test_data = "Метаданные;".encode("utf-8")
+        for test_haystack in [test_data, bytearray(test_data),
+                              memoryview(test_data)]:
+            for func in self.substring_finders:
+                self.assertEqual(func(test_haystack, "данные"), (8, 20))
+                self.assertEqual(func(test_haystack, "данные".encode()),
+                                 (8, 20))
+
+    def test_mmap_haystack(self):
+        test_data = b"bbaaaaaaa;"
+        with mmap.mmap(-1, len(test_data)) as m:
+            m.write(test_data)
+            for func in self.substring_finders:
+                self.assertEqual(func(m, "aa"), (2, 4))
+                self.assertEqual(
+                    substring_finder.findall(m, "aa", func,
+                                             overlapping=False),
+                    [(2, 4), (4, 6), (6, 8)])
+
+    def test_binary_needle_in_str(self):
+        with self.assertRaises(TypeError):
+            substring_finder.KMP_algorithm("abc", b"b")
+
+    def test_utf8_char_offsets(self):
+        test_string = "Метаданные; данные"
+        test_data = test_string.encode("utf-8")
+        spans = substring_finder.findall(test_data, "данные")
+        self.assertEqual(substring_finder.utf8_char_spans(test_data, spans),
+                         substring_finder.findall(test_string, "данные"))
+        self.assertEqual(substring_finder.utf8_char_offset(test_data, 8), 4)
+
+
+class Find_all_tests(unittest.TestCase):
+    substring_finders = SUBSTRING_FINDERS
+
+    def test_no_substring(self):
+        for func in self.substring_finders:
+            self.assertEqual(
+                substring_finder.findall("asdfghjkl;", "asde", func), [])
+
+    def test_overlapping_occurrences(self):
+        test_string = "bbaaaab"
+        test_substring = "aa"
+        for func in self.substring_finders:
+            self.assertEqual(
+                substring_finder.findall(test_string, test_substring, func),
+                [(2, 4), (3, 5), (4, 6)])
+
+    def test_non_overlapping_occurrences(self):
+        test_string = "bbaaaab"
+        test_substring = "aa"
+        for func in self.substring_finders:
+            self.assertEqual(
+                substring_finder.findall(test_string, test_substring, func,
+                                         overlapping=False),
+                [(2, 4), (4, 6)])
+
+    def test_periodic_needle_in_repetitive_text(self):
+        test_string = "ab" * 20
+        test_substring = "abab"
+        for func in self.substring_finders:
+            self.assertEqual(
+                len(substring_finder.findall(test_string, test_substring,
+                                             func)),
+                19)
+            self.assertEqual(
+                len(substring_finder.findall(test_string, test_substring,
+                                             func, overlapping=False)),
+                10)
+
+    def test_finditer_is_lazy(self):
+        for func in self.substring_finders:
+            matches = substring_finder.finditer("ababab", "ab", func)
+            self.assertEqual(next(matches), (0, 2))
+            self.assertEqual(next(matches), (2, 4))
+
+    def test_matches_agree_with_str_find(self):
+        test_string = "Метаданные; данные, данн, данные"
+        test_substring = "данные"
+        expected = []
+        start = test_string.find(test_substring)
+        while start != -1:
+            expected.append((start, start + len(test_substring)))
+            start = test_string.find(test_substring, start + 1)
+        for func in self.substring_finders:
+            self.assertEqual(
+                substring_finder.findall(test_string, test_substring, func),
+                expected)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            substring_finder.findall("abc", "a", len)
+
+
+class Compiled_matcher_tests(unittest.TestCase):
+    substring_finders = SUBSTRING_FINDERS
+
+    def setUp(self):
+        substring_finder.purge()
+
+    def test_compiled_matcher_agrees_with_finder(self):
+        for func in self.substring_finders:
+            matcher = substring_finder.compile("данные", func)
+            for test_string in ["Метаданные;", "данн", "данные, данные"]:
+                self.assertEqual(matcher.find(test_string),
+                                 func(test_string, "данные"))
+                self.assertEqual(
+                    matcher.findall(test_string),
+                    substring_finder.findall(test_string, "данные", func))
+
+    def test_repeated_calls_reuse_tables(self):
+        substring_finder.KMP_algorithm("asdfghjkl;", "fgh")
+        substring_finder.KMP_algorithm("fghfgh", "fgh")
+        substring_finder.compile("fgh", substring_finder.KMP_algorithm)
+        # The prefix function and the matcher shared by the calls
+        self.assertEqual(len(substring_finder._tables), 2)
+        self.assertIs(
+            substring_finder._matcher("fgh", substring_finder.KMP_algorithm),
+            substring_finder._matcher("fgh", substring_finder.KMP_algorithm))
+
+    def test_changed_needles_are_not_cached(self):
+        needles = ["abcd", "c"]
+        substring_finder.AC_algorithm("xxabcdxxcd", needles)
+        needles.append("xx")
+        self.assertEqual(
+            substring_finder.findall(b"xxabcdxxcd", ["abcd", "c"],
+                                     substring_finder.AC_algorithm),
+            [(4, 5), (2, 6), (8, 9)])
+
+    def test_cache_is_bounded(self):
+        table_size = substring_finder._TableCache._measure(
+            substring_finder.prefix_function("abcd"))
+        cache = substring_finder._TableCache(max_size=table_size * 2)
+        for needle in ["abcd", "efgh", "ijkl"]:
+            cache.get(substring_finder.prefix_function, needle)
+        self.assertEqual(len(cache), 2)
+        cache.get(substring_finder.prefix_function, "a" * 100)
+        self.assertEqual(len(cache), 2)
+
+    def test_automata_are_measured_in_bytes(self):
+        automaton = substring_finder.build_AC_automaton(["abc", "bcd"])
+        self.assertEqual(substring_finder._TableCache._measure(automaton),
+                         automaton.nbytes)
+
+
+class Operation_count_tests(unittest.TestCase):
+    def test_counts(self):
+        with substring_finder.count_operations() as counts:
+            self.assertEqual(
+                substring_finder.KMP_algorithm("aaab", "aab"), (1, 4))
+        self.assertEqual(counts.comparisons, 5)
+        self.assertEqual(counts.failure_links, 1)
+        with substring_finder.count_operations() as counts:
+            substring_finder.BMH_algorithm("xxxxabc", "abc")
+        self.assertEqual((counts.comparisons, counts.shifts), (7, 2))
+        substring_finder.KMP_algorithm("aaab", "aab")
+        self.assertEqual(counts.comparisons, 7)
+
+    def test_hybrid_reads_only_candidates(self):
+        haystack = "ab" * 1000 + "abz"
+        for data in [haystack, memoryview(haystack.encode("utf-8"))]:
+            with substring_finder.count_operations() as counts:
+                self.assertEqual(substring_finder.findall(
+                    data, "abz", substring_finder.hybrid_algorithm),
+                    [(2000, 2003)])
+            self.assertEqual(counts.comparisons, 3)
+
+    def test_results_are_not_changed(self):
+        test_string = "Метаданные; данные, данн, данные"
+        for func in substring_finder._engines:
+            for haystack in [test_string, test_string.encode("utf-8")]:
+                expected = substring_finder.findall(haystack, "данные", func)
+                with substring_finder.count_operations() as counts:
+                    self.assertEqual(
+                        substring_finder.findall(haystack, "данные", func),
+                        expected)
+                self.assertGreater(counts.comparisons, 0)
+
+
+class Fuzzy_search_tests(unittest.TestCase):
+    def test_mismatches(self):
+        test_string = "Метаданные; донные"
+        self.assertEqual(
+            list(substring_finder.shift_or_fuzzy_finditer(
+                test_string, "данные", 1)),
+            [(4, 10, 0), (12, 18, 1)])
+        self.assertEqual(
+            list(substring_finder.shift_or_fuzzy_finditer(
+                test_string, "данные", 0)),
+            [(4, 10, 0)])
+
+    def test_edits(self):
+        test_string = "xx abxcd xx"
+        self.assertEqual(
+            list(substring_finder.shift_or_fuzzy_finditer(
+                test_string, "abcd", 1, edits=True)),
+            [(3, 8, 1)])
+        self.assertEqual(
+            list(substring_finder.shift_or_fuzzy_finditer(
+                test_string, "abcd", 1)),
+            [])
+
+    def test_non_overlapping(self):
+        self.assertEqual(
+            list(substring_finder.shift_or_fuzzy_finditer(
+                "aabaab", "ab", 1, overlapping=False)),
+            [(0, 2, 1), (3, 5, 1)])
+
+    def test_negative_errors(self):
+        with self.assertRaises(ValueError):
+            substring_finder.shift_or_fuzzy_finditer("abc", "b", -1)
+
+
+class Batch_search_tests(unittest.TestCase):
+    def test_every_match_of_every_needle(self):
+        test_string = "ushers"
+        needles = ["he", "she", "his", "hers"]
+        self.assertEqual(
+            list(substring_finder.AC_batch_finditer(test_string, needles)),
+            [(1, 1, 4), (0, 2, 4), (3, 2, 6)])
+        self.assertEqual(
+            substring_finder.AC_batch_findall(test_string, needles),
+            [[(2, 4)], [(1, 4)], [], [(2, 6)]])
+
+    def test_duplicate_needles(self):
+        self.assertEqual(
+            substring_finder.AC_batch_findall("abab", ["ab", "b", "ab"]),
+            [[(0, 2), (2, 4)], [(1, 2), (3, 4)], [(0, 2), (2, 4)]])
+
+    def test_binary_haystack(self):
+        test_data = "Метаданные; данные".encode("utf-8")
+        self.assertEqual(
+            substring_finder.AC_batch_findall(test_data, ["данные", "ные"]),
+            [[(8, 20), (22, 34)], [(14, 20), (28, 34)]])
+
+    def test_output_links(self):
+        automaton = substring_finder.build_AC_automaton(
+            ["he", "she", "his", "hers"])
+        she = 0
+        for char in "she":
+            she = automaton.goto(she, char)
+        self.assertEqual(automaton.word_ids[automaton.output[she]], (1,))
+        he = automaton.output_link[she]
+        self.assertEqual(automaton.word_ids[he], (0,))
+        self.assertEqual(automaton.output_link[he], -1)
+
+
+class Rabin_Karp_tests(unittest.TestCase):
+    def test_agrees_with_aho_corasick(self):
+        test_string = "xxabcdxxcd; abcd"
+        needles = ["abcd", "c", "cd", "xx"]
+        for overlapping in [True, False]:
+            self.assertEqual(
+                substring_finder.findall(test_string, needles,
+                                         substring_finder.RK_algorithm,
+                                         overlapping),
+                substring_finder.findall(test_string, needles,
+                                         substring_finder.AC_algorithm,
+                                         overlapping))
+        self.assertEqual(
+            substring_finder.RK_algorithm(test_string, needles), (0, 2))
+        self.assertEqual(
+            substring_finder.RK_algorithm(test_string, ["asde"]), -1)
+
+    def test_batch_with_duplicates(self):
+        test_string = "Метаданные; данные"
+        needles = ["данные", "ные", "данные", "та"]
+        self.assertEqual(
+            list(substring_finder.RK_batch_finditer(test_string, needles)),
+            list(substring_finder.AC_batch_finditer(test_string, needles)))
+        self.assertEqual(
+            list(substring_finder.RK_batch_finditer(
+                test_string.encode("utf-8"), needles)),
+            [(3, 4, 8), (0, 8, 20), (2, 8, 20), (1, 14, 20),
+             (0, 22, 34), (2, 22, 34), (1, 28, 34)])
+
+
+class Incremental_automaton_tests(unittest.TestCase):
+    def test_agrees_with_rebuilt_automaton(self):
+        test_string = "xxabcdxxcd; abcd"
+        automaton = IncrementalAutomaton(["abcd", "c"])
+        needles = ["abcd", "c"]
+        for word, add in [("cd", True), ("xx", True), ("c", False),
+                          ("abcd", False), ("bcd", True)]:
+            if add:
+                automaton.add(word)
+                needles.append(word)
+            else:
+                automaton.remove(word)
+                needles.remove(word)
+            for overlapping in [True, False]:
+                self.assertEqual(
+                    automaton.findall(test_string, overlapping),
+                    substring_finder.findall(test_string, needles,
+                                             substring_finder.AC_algorithm,
+                                             overlapping))
+
+    def test_word_ids(self):
+        automaton = IncrementalAutomaton()
+        self.assertEqual(automaton.add("данные"), 0)
+        self.assertEqual(automaton.add("ные"), 1)
+        self.assertEqual(automaton.add("данные"), 0)
+        self.assertEqual(list(automaton.batch_finditer("Метаданные")),
+                         [(0, 4, 10), (1, 7, 10)])
+        automaton.remove("данные")
+        self.assertNotIn("данные", automaton)
+        self.assertEqual(len(automaton), 1)
+        self.assertEqual(automaton.find("Метаданные"), (7, 10))
+        with self.assertRaises(KeyError):
+            automaton.remove("данные")
+
+
+class Compact_automaton_tests(unittest.TestCase):
+    def test_states_are_numbered_in_bfs_order(self):
+        automaton = CompactAutomaton(Trie(["he", "she", "his"]))
+        self.assertEqual(len(automaton), 8)
+        self.assertEqual(list(automaton.depth), [0, 1, 1, 2, 2, 2, 3, 3])
+
+    def test_goto_follows_failure_links(self):
+        automaton = CompactAutomaton(Trie(["he", "she", "hers"]))
+        state = 0
+        for char in "she":
+            state = automaton.goto(state, char)
+        self.assertEqual(automaton.depth[state], 3)
+        self.assertEqual(automaton.depth[automaton.fail[state]], 2)
+        state = automaton.goto(state, "r")
+        self.assertEqual(automaton.depth[state], 3)
+        self.assertEqual(automaton.goto(state, "x"), 0)
+
+    def test_output_is_longest_needle_ending_in_state(self):
+        automaton = CompactAutomaton(Trie(["abcd", "bc"]))
+        state = 0
+        for char in "abc":
+            state = automaton.goto(state, char)
+        self.assertEqual(automaton.depth[automaton.output[state]], 2)
+
+    def test_memory_is_linear_in_states(self):
+        words = [f"{i:x}" for i in range(70000)]
+        automaton = CompactAutomaton(Trie(words))
+        self.assertGreater(len(automaton), 0xFFFF)
+        self.assertLess(automaton.nbytes / len(automaton), 40)
+
+    def test_save_and_load(self):
+        test_string = "Метаданные; данные, данн, данные"
+        needles = ["данные", "ные", "данн", "та"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "automaton.bin")
+            for haystack, words in [
+                    (test_string, needles),
+                    (test_string.encode("utf-8"),
+                     [e.encode("utf-8") for e in needles])]:
+                substring_finder.build_AC_automaton(words).save(path)
+                loaded = CompactAutomaton.load(path)
+                self.assertEqual(
+                    list(substring_finder.AC_automaton_finditer(haystack,
+                                                                loaded)),
+                    substring_finder.findall(haystack, words,
+                                             substring_finder.AC_algorithm))
+                self.assertEqual(
+                    list(substring_finder.AC_automaton_batch_finditer(
+                        haystack, loaded)),
+                    list(substring_finder.AC_batch_finditer(haystack, words)))
+                del loaded
+
+    def test_load_rejects_other_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "automaton.bin")
+            with open(path, "wb") as f:
+                f.write(b"\0" * 64)
+            with self.assertRaises(ValueError):
+                CompactAutomaton.load(path)
+
+
+class Streaming_tests(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.substring_finders = [
+            substring_finder.KMP_algorithm,
+            substring_finder.BMH_algorithm,
+            substring_finder.AC_algorithm
+        ]
+
+    def test_matches_across_chunk_boundaries(self):
+        test_data = "bbaaaab".encode("utf-8")
+        for func in self.substring_finders:
+            self.assertEqual(
+                list(streaming.stream_finditer(io.BytesIO(test_data), "aa",
+                                               func, chunk_size=3)),
+                [(2, 4), (3, 5), (4, 6)])
+            self.assertEqual(
+                list(streaming.stream_finditer(io.BytesIO(test_data), "aa",
+                                               func, overlapping=False,
+                                               chunk_size=3)),
+                [(2, 4), (4, 6)])
+
+    def test_offsets_are_in_bytes(self):
+        test_data = "Метаданные;".encode("utf-8")
+        for func in self.substring_finders:
+            self.assertEqual(
+                streaming.stream_find(io.BytesIO(test_data), "данные", func,
+                                      chunk_size=5),
+                (8, 20))
+
+    def test_file_path_and_mmap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "text.txt")
+            with open(path, "wb") as f:
+                f.write(b"asdfghjkl;" * 3)
+            for func in self.substring_finders:
+                self.assertEqual(
+                    streaming.stream_find(path, "l;a", func, chunk_size=4),
+                    (8, 11))
+            with open(path, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                for func in self.substring_finders:
+                    self.assertEqual(
+                        streaming.stream_find(m, "l;a", func, chunk_size=4),
+                        (8, 11))
+
+    def test_no_substring(self):
+        for func in self.substring_finders:
+            self.assertEqual(
+                streaming.stream_find(io.BytesIO(b"asdfghjkl;"), "asde",
+                                      func, chunk_size=2),
+                -1)
+
+    def test_unsupported_engine(self):
+        with self.assertRaises(ValueError):
+            streaming.stream_find(io.BytesIO(b"abc"), "a",
+                                  substring_finder.brute_force)
+
+
+class Parallel_search_tests(unittest.TestCase):
+    substring_finders = SUBSTRING_FINDERS
+
+    def setUp(self):
+        self.min_segment_size = parallel.MIN_SEGMENT_SIZE
+        parallel.MIN_SEGMENT_SIZE = 4
+
+    def tearDown(self):
+        parallel.MIN_SEGMENT_SIZE = self.min_segment_size
+
+    def test_matches_crossing_segment_borders(self):
+        test_string = "Метаданные; данные, данн, данные"
+        for func in self.substring_finders:
+            for overlapping in [True, False]:
+                self.assertEqual(
+                    parallel.parallel_findall(test_string, "данные", func,
+                                              overlapping, workers=3),
+                    substring_finder.findall(test_string, "данные", func,
+                                             overlapping))
+            self.assertEqual(
+                parallel.parallel_find(test_string, "данные", func,
+                                       workers=3),
+                (4, 10))
+
+    def test_several_needles(self):
+        test_string = "xxabcdxxcd"
+        needles = ["abcd", "c", "cd"]
+        for overlapping in [True, False]:
+            for func in [substring_finder.AC_algorithm,
+                         substring_finder.RK_algorithm]:
+                self.assertEqual(
+                    parallel.parallel_findall(test_string, needles, func,
+                                              overlapping, workers=4),
+                    substring_finder.findall(test_string, needles, func,
+                                             overlapping))
+
+    def test_no_substring(self):
+        for func in self.substring_finders:
+            self.assertEqual(
+                parallel.parallel_find("asdfghjkl;" * 3, "asde", func,
+                                       workers=3),
+                -1)
+
+
+class Async_search_tests(unittest.TestCase):
+    def test_documents_are_searched_with_backpressure(self):
+        pulled = []
+
+        async def documents():
+            for i in range(10):
+                pulled.append(i)
+                yield f"document{i}", "Метаданные; данные" * (i + 1)
+
+        async def search():
+            results = []
+            async for result in async_search.search_documents(
+                    documents(), "данные", concurrency=2,
+                    executor=ThreadPoolExecutor(2)):
+                results.append(result)
+                self.assertLessEqual(len(pulled), len(results) + 2)
+            return results
+
+        results = asyncio.run(search())
+        self.assertEqual(
+            sorted((e.name, len(e.matches)) for e in results),
+            sorted((f"document{i}", 2 * (i + 1)) for i in range(10)))
+
+    def test_queue_and_files(self):
+        async def search(documents, needle, engine):
+            return [e async for e in async_search.search_documents(
+                documents, needle, engine, concurrency=1)]
+
+        queue = asyncio.Queue()
+        queue.put_nowait(("message", b"xxabcdxxcd"))
+        queue.put_nowait(None)
+        self.assertEqual(
+            asyncio.run(search(async_search.read_queue(queue),
+                               ["abcd", "c", "cd"],
+                               substring_finder.AC_algorithm)),
+            [("message", [(4, 5), (2, 6), (8, 9), (8, 10)])])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "text.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("Метаданные; данные")
+            self.assertEqual(
+                asyncio.run(search(async_search.read_files([path], "utf-8"),
+                                   "данные", substring_finder.KMP_algorithm)),
+                [(path, [(4, 10), (12, 18)])])
+
+
+class Suffix_array_tests(unittest.TestCase):
+    def test_suffixes_are_sorted(self):
+        test_string = "Метаданные; данные"
+        index = SuffixArray(test_string)
+        self.assertEqual(list(index.sa),
+                         sorted(range(len(test_string)),
+                                key=lambda i: test_string[i:]))
+
+    def test_queries(self):
+        index = SuffixArray("Метаданные; данные, данн, данные")
+        self.assertEqual(index.find("данные"), (4, 10))
+        self.assertEqual(index.count("данные"), 3)
+        self.assertEqual(index.find_all("данн"),
+                         [(4, 8), (12, 16), (20, 24), (26, 30)])
+        self.assertEqual(index.find("asde"), -1)
+        self.assertEqual(index.count("asde"), 0)
+
+    def test_many_occurrences(self):
+        test_string = "ab" * 500 + "b"
+        index = SuffixArray(test_string)
+        self.assertEqual(index.count("ab"), 500)
+        self.assertEqual(index.count("bb"), 1)
+        self.assertEqual(index.find("ba"), (1, 3))
+        self.assertEqual(index.find("bb"), (999, 1001))
+
+    def test_range_minimum(self):
+        values = [5, 3, 8, 1, 9, 2, 7, 4, 6]
+        minimum = RangeMinimum(values, block_size=2)
+        for begin in range(len(values)):
+            for end in range(begin + 1, len(values) + 1):
+                self.assertEqual(minimum.query(begin, end),
+                                 min(values[begin:end]))
+
+    def test_save_and_load(self):
+        index = SuffixArray("bbaaaaaaa;")
+        buffer = io.BytesIO()
+        index.save(buffer)
+        buffer.seek(0)
+        loaded = SuffixArray.load(buffer)
+        self.assertEqual(loaded.haystack, index.haystack)
+        self.assertEqual(loaded.sa, index.sa)
+        self.assertEqual(loaded.find_all("aa"), index.find_all("aa"))
+
+    def test_load_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            SuffixArray.load(io.BytesIO(b"\0" * 64))
+
+
+class Benchmark_helpers_tests(unittest.TestCase):
+    def test_outliers(self):
+        self.assertEqual(helpers.find_outliers([1.0, 1.1, 0.9, 1.0, 5.0]), [4])
+        self.assertEqual(helpers.find_outliers([1.0, 2.0, 3.0, 4.0]), [])
+
+    def test_student_t_distribution(self):
+        for df, quantile in [(5, 2.5706), (20, 2.0860), (100, 1.9840)]:
+            self.assertAlmostEqual(
+                helpers.student_t_quantile(0.975, df), quantile, places=4)
+        self.assertAlmostEqual(helpers.student_t_sf(2.0, 3), 0.0697, places=4)
+        self.assertAlmostEqual(Reporter.get_alpha(7), 2.4469, places=4)
+
+    def test_regression_verdict(self):
+        def measurement(name, times):
+            return helpers.Measurement("case", name, times, [], 1)
+
+        baseline = [measurement("f", [1.0, 1.1, 0.9, 1.0, 1.05]),
+                    measurement("g", [1.0, 1.1, 0.9, 1.0, 1.05]),
+                    measurement("h", [1.0, 1.1, 0.9, 1.0, 1.05]),
+                    measurement("old", [1.0, 1.1])]
+        current = [measurement("f", [2.0, 2.1, 1.9, 2.0, 2.05]),
+                   measurement("g", [0.5, 0.6, 0.4, 0.5, 0.55]),
+                   measurement("h", [1.1, 1.0, 0.9, 1.05, 1.0]),
+                   measurement("new", [1.0, 1.1])]
+        comparisons = regression.compare(baseline, current)
+        self.assertEqual([e.verdict for e in comparisons],
+                         ["slower", "faster", "unchanged", "new", "missing"])
+        self.assertAlmostEqual(comparisons[0].change, 1 / 1.01, places=6)
+        verdict = regression.make_verdict(comparisons)
+        self.assertFalse(verdict["passed"])
+        self.assertEqual((verdict["slower"], verdict["faster"]), (1, 1))
+        self.assertTrue(regression.make_verdict(comparisons[1:])["passed"])
+        report = regression.diff_report(comparisons).splitlines()
+        self.assertTrue(report[6].startswith("|case|f|"))
+        self.assertIn("**slower**", report[6])
+
+    def test_memory_measurement(self):
+        self.assertGreaterEqual(
+            helpers.measure_memory(lambda: [bytes(1 << 20)]), 1 << 20)
+
+    def test_operations_of_uninstrumented_finders(self):
+        with tempfile.TemporaryDirectory() as directory:
+            text_path = os.path.join(directory, "text.txt")
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write("xxabcxx")
+            measurements = [
+                helpers._measure_cell(finder, text_path, "abc", "case", 2,
+                                      1000, True)
+                for finder in [substring_finder.KMP_algorithm,
+                               vectorized_finder.vectorized_finder]]
+        self.assertEqual(measurements[0].operations["comparisons"], 5)
+        self.assertIsNone(measurements[1].operations)
+        self.assertEqual(Reporter._format_operations(measurements[1]), "-")
+
+    def test_results_store_round_trip(self):
+        measurements = [
+            helpers.Measurement("Case, with comma", "KMP_algorithm",
+                                [0.5, 0.25, 0.125], [1], 4, 1024,
+                                {"comparisons": 3}),
+            helpers.Measurement("Case", "BMH_algorithm", [1e-06], [], 1000),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ["results.json", "results.csv"]:
+                store = helpers.ResultsStore(os.path.join(directory, name))
+                store.save(measurements)
+                self.assertEqual(store.load(), measurements)
+        with self.assertRaises(ValueError):
+            helpers.ResultsStore("results.txt")
+
+    def test_cached_cells_are_not_measured_again(self):
+        calls = []
+
+        def finder(haystack, needle):
+            calls.append(needle)
+            return haystack.find(needle)
+
+        with tempfile.TemporaryDirectory() as directory:
+            text_path = os.path.join(directory, "text.txt")
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write("Метаданные; данные")
+            parameters = [(text_path, "данные", "Case")]
+            tester = helpers.Tester(
+                [finder, substring_finder.KMP_algorithm], parameters, 6,
+                os.path.join(directory, "results.json"), min_sample_time=0,
+                cache_directory=os.path.join(directory, "cache"))
+            measurements = tester.test()
+            self.assertEqual([e.name for e in measurements],
+                             ["finder", "KMP_algorithm"])
+            calls.clear()
+            self.assertEqual(tester.test(), measurements)
+            self.assertEqual(calls, [])
+            self.assertEqual(tester.results.load(), measurements)
+            tester.test(use_cache=False)
+            self.assertNotEqual(calls, [])
+            calls.clear()
+            tester.cache = None
+            tester.test()
+            self.assertNotEqual(calls, [])
+
+    def test_cell_key_depends_on_imported_modules(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in [("finder_module", "import helper_module\n"
+                                  "def finder(h, n):\n"
+                                  "    return helper_module.find(h, n)\n"),
+                                 ("helper_module", "def find(h, n):\n"
+                                  "    return h.find(n)\n")]:
+                with open(os.path.join(directory, name + ".py"), "w") as f:
+                    f.write(source)
+            sys.path.insert(0, directory)
+            try:
+                finder = importlib.import_module("finder_module").finder
+
+                def key():
+                    helpers._dependency_sources.cache_clear()
+                    return helpers.cell_key(finder, "", "n", "case", 6, 0,
+                                            False)
+
+                before = key()
+                self.assertEqual(key(), before)
+                with open(os.path.join(directory, "helper_module.py"),
+                          "a") as f:
+                    f.write("# changed\n")
+                self.assertNotEqual(key(), before)
+            finally:
+                sys.path.remove(directory)
+                for name in ["finder_module", "helper_module"]:
+                    sys.modules.pop(name, None)
+                helpers._dependency_sources.cache_clear()
+
+
+class Scaling_benchmark_tests(unittest.TestCase):
+    def test_generated_text(self):
+        for distribution in corpus.DISTRIBUTIONS:
+            text = corpus.generate_text(5000, 3, distribution, seed=1)
+            self.assertEqual(len(text), 5000)
+            self.assertEqual(set(text), set("abc"))
+            self.assertEqual(text, corpus.generate_text(5000, 3,
+                                                        distribution, seed=1))
+        zipf_text = corpus.generate_text(5000, 3, "zipf")
+        self.assertGreater(zipf_text.count("a"), zipf_text.count("c"))
+        self.assertEqual(len(corpus.make_alphabet(100)), 100)
+        self.assertEqual(corpus.periodic_needle(5, 2), "ababa")
+
+    def test_adversarial_cases(self):
+        for make_case in corpus.ADVERSARIAL_CASES.values():
+            haystack, needle = make_case(100, 8)
+            self.assertEqual((len(haystack), len(needle)), (100, 8))
+            self.assertEqual(haystack.find(needle), -1)
+
+    def test_fit_power_law(self):
+        points = [helpers.Point("f", x, 3 * x ** 2, 0) for x in [2, 4, 8]]
+        exponent, coefficient = scaling.fit_power_law(points)
+        self.assertAlmostEqual(exponent, 2)
+        self.assertAlmostEqual(coefficient, 3)
+        self.assertEqual(
+            scaling.fit_complexity({"sweep": points + points[:1]})[0][:2],
+            ("sweep", "f"))
+
+
+class Command_line_tests(unittest.TestCase):
+    def test_newline_index(self):
+        index = cli.NewlineIndex("ab\n\ncd\nef")
+        self.assertEqual(index.newlines, [2, 3, 6])
+        self.assertEqual([index.position(i) for i in [0, 1, 2, 3, 4, 8]],
+                         [(1, 1), (1, 2), (1, 3), (2, 1), (3, 1), (4, 2)])
+        self.assertEqual((index.line_start(3), index.line_end(3)), (4, 6))
+        self.assertEqual(index.line_end(4), 9)
+
+    def run_cli(self, *arguments):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = cli.main(list(arguments))
+        return code, output.getvalue().splitlines()
+
+    def test_search(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, "sub"))
+            first = os.path.join(directory, "a.txt")
+            second = os.path.join(directory, "sub", "b.txt")
+            with open(first, "w", encoding="utf-8") as f:
+                f.write("hello world\nданные, данные\n")
+            with open(second, "w", encoding="utf-8") as f:
+                f.write("world\n")
+            self.assertEqual(self.run_cli("данные", directory), (0, [
+                f"{first}:2:1:данные, данные",
+                f"{first}:2:9:данные, данные"]))
+            self.assertEqual(self.run_cli("-e", "world", "-e", "данные",
+                                          "-m", directory),
+                             (0, [f"{first}:1:7:hello world",
+                                  f"{second}:1:1:world"]))
+            self.assertEqual(
+                self.run_cli("--engine", "KMP_algorithm", "-c", "o", first,
+                             second), (0, [f"{first}:2", f"{second}:1"]))
+            self.assertEqual(self.run_cli("-c", "xyz", directory),
+                             (1, [f"{first}:0", f"{second}:0"]))
+
+    def test_every_hit_of_several_patterns(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "a.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("she sells\nsea shells\n")
+            for engine in ["AC_algorithm", "RK_algorithm"]:
+                code, output = self.run_cli("--engine", engine, "-e", "he",
+                                            "-e", "she", path)
+                self.assertEqual(sorted(e.split(":")[1:3] for e in output),
+                                 [["1", "1"], ["1", "2"], ["2", "5"],
+                                  ["2", "6"]])
+                self.assertEqual(self.run_cli("--engine", engine, "-c", "-e",
+                                              "he", "-e", "she", path),
+                                 (0, [f"{path}:4"]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,131 @@
+from substring_finder import KMP_algorithm, BMH_algorithm, AC_algorithm, \
+    prefix_function, Text, Needles
+from vectorized_finder import vectorized_finder
+from collections import namedtuple
+from timeit import default_timer
+from typing import Callable, Union
+import json
+
+DispatchConfig = namedtuple('DispatchConfig', [
+    'vectorized_linear_factor',
+    'vectorized_quadratic_factor',
+    'short_needle',
+    'small_alphabet',
+    'long_periodic_needle',
+])
+
+# Calibrated with calibrate() on SmallDataWithoutRepeating.txt and checked
+# on the cases of main.py. BMH costs about len(haystack) / len(needle)
+# steps while the vectorized engine costs a few array passes over the
+# haystack plus a NumPy call per needle character and block, so the
+# haystack size at which the vectorized engine wins grows with the needle:
+# about 125 * len(needle) for short needles and 5 * len(needle) ** 2 for
+# long ones
+DEFAULT_CONFIG = DispatchConfig(
+    vectorized_linear_factor=125,
+    vectorized_quadratic_factor=5,
+    short_needle=3,
+    small_alphabet=2,
+    long_periodic_needle=64,
+)
+
+config = DEFAULT_CONFIG
+
+
+def find(haystack: Text, needle: Needles) -> Union[tuple, int]:
+    """Finds the first occurrence with the engine chosen for the input"""
+    return choose_engine(haystack, needle, config)(haystack, needle)
+
+
+def choose_engine(haystack: Text, needle: Needles,
+                  dispatch_config: DispatchConfig = None) -> Callable:
+    """
+    Several needles go to Aho-Corasick. Big haystacks go to the vectorized
+    engine, unless the needle is long, periodic and made of very few
+    characters: then every position survives the vectorized filters and
+    KMP is linear. Small haystacks go to BMH, or to KMP for short needles
+    and needles which make BMH shift by one character
+    """
+    dispatch_config = dispatch_config or config
+    if not isinstance(needle, (str, bytes, bytearray, memoryview)):
+        return AC_algorithm
+    small_alphabet = len(set(needle)) <= dispatch_config.small_alphabet
+    if len(haystack) >= vectorized_min_haystack(len(needle), dispatch_config):
+        if small_alphabet \
+                and len(needle) >= dispatch_config.long_periodic_needle \
+                and is_periodic(needle):
+            return KMP_algorithm
+        return vectorized_finder
+    if len(needle) < dispatch_config.short_needle \
+            or small_alphabet and is_periodic(needle):
+        return KMP_algorithm
+    return BMH_algorithm
+
+
+def vectorized_min_haystack(needle_length: int,
+                            dispatch_config: DispatchConfig = None) -> int:
+    dispatch_config = dispatch_config or config
+    return max(dispatch_config.vectorized_linear_factor * needle_length,
+               dispatch_config.vectorized_quadratic_factor
+               * needle_length ** 2)
+
+
+def is_periodic(needle: Union[str, bytes]) -> bool:
+    """A needle is periodic if it overlaps itself by at least a half"""
+    if len(needle) < 2:
+        return False
+    period = len(needle) - prefix_function(needle)[-1]
+    return 2 * period <= len(needle)
+
+
+def load_config(path: str) -> DispatchConfig:
+    """Reads thresholds from a JSON file, missing ones keep their defaults"""
+    with open(path, encoding='utf-8') as f:
+        return DEFAULT_CONFIG._replace(**json.load(f))
+
+
+def save_config(dispatch_config: DispatchConfig, path: str) -> None:
+    with open(path, mode='w', encoding='utf-8') as f:
+        json.dump(dispatch_config._asdict(), f, indent=4)
+
+
+def calibrate(haystack: str, needle_lengths: tuple = (2, 4, 8, 16, 32, 64),
+              repeats: int = 5) -> DispatchConfig:
+    """
+    Measures for every needle length the smallest prefix of the haystack
+    on which the vectorized engine beats BMH, and fits the factors of
+    vectorized_min_haystack to these sizes. The needles are taken from
+    the end of the haystack, so that both engines scan the whole prefix
+    """
+    linear, quadratic = [], []
+    for m in needle_lengths:
+        size = 2 * m
+        while size < len(haystack):
+            text = haystack[:size]
+            needle = text[-m:]
+            if _best_time(vectorized_finder, text, needle, repeats) \
+                    < _best_time(BMH_algorithm, text, needle, repeats):
+                break
+            size *= 2
+        else:
+            continue
+        if m <= 32:
+            linear.append(size / m)
+        else:
+            quadratic.append(size / m ** 2)
+    return DEFAULT_CONFIG._replace(
+        vectorized_linear_factor=round(max(
+            linear, default=DEFAULT_CONFIG.vectorized_linear_factor)),
+        vectorized_quadratic_factor=round(max(
+            quadratic, default=DEFAULT_CONFIG.vectorized_quadratic_factor)))
+
+
+def _best_time(finder: Callable, haystack: str, needle: str,
+               repeats: int) -> float:
+    finder(haystack, needle)
+    times = []
+    for _ in range(repeats):
+        start_time = default_timer()
+        finder(haystack, needle)
+        times.append(default_timer() - start_time)
+    return min(times)
@@ -1,8 +1,23 @@
-from typing import Callable, Union, Pattern
-from timeit import default_timer
+from typing import Callable, Union, Pattern, Optional, Iterator
+from substring_finder import purge, count_operations, INSTRUMENTED_ENGINES
+from time import perf_counter_ns
 import matplotlib.pyplot as plt
-from collections import namedtuple
-from math import sqrt
+from collections import namedtuple, defaultdict
+from math import sqrt, ceil, exp, log, lgamma, copysign, inf
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+import multiprocessing
+import hashlib
+import ast
+import importlib.metadata
+import inspect
+import queue
+import json
+import csv
+import tracemalloc
+import gc
+import sys
+import os
 import re
 
 Documentation = namedtuple('Documentation',
@@ -10,18 +25,14 @@ Documentation = namedtuple('Documentation',
 TestingResult = namedtuple('TestingResult',
                            ['name', 'confidence_interval', 'average_time'])
 PatternContent = namedtuple('PatternContent', ['number', 'content'])
+Measurement = namedtuple('Measurement',
+                         ['case', 'name', 'times', 'outliers', 'loops',
+                          'peak_memory', 'operations'],
+                         defaults=(None, None))
 
-
-def save_intermediate_results(data: Union[list, str],
-                              mode: str,
-                              path_to_save: str) -> None:
-    with open(path_to_save, encoding='utf-8', mode=mode) as f:
-        if isinstance(data, str):
-            f.write(f'{data}\n')
-        elif isinstance(data, list):
-            f.writelines(data)
-        else:
-            raise ValueError(f'Incorrect type to save: {type(data)}')
+MIN_SAMPLE_TIME_NS = 1_000_000
+MAX_WARM_UPS = 10
+WARM_UP_TOLERANCE = 0.05
 
 
 def calculate_confidence_interval(alpha: float,
@@ -33,6 +44,182 @@ def calculate_confidence_interval(alpha: float,
     return alpha * standard_deviation / sqrt(repetition)
 
 
+def student_t_quantile(p: float, df: float) -> float:
+    """Quantile of Student's t distribution with df degrees of freedom"""
+    if not 0 < p < 1:
+        raise ValueError(f'Probability must be in (0, 1): {p}')
+    if p < 0.5:
+        return -student_t_quantile(1 - p, df)
+    low, high = 0.0, 1.0
+    while student_t_sf(high, df) > 1 - p:
+        low, high = high, high * 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if student_t_sf(middle, df) > 1 - p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def student_t_sf(t: float, df: float) -> float:
+    """Probability that Student's t with df degrees of freedom exceeds t"""
+    tail = _incomplete_beta(df / 2, 0.5, df / (df + t * t)) / 2
+    return tail if t >= 0 else 1 - tail
+
+
+def welch_t_test(a: list[float], b: list[float]) -> tuple[float, float]:
+    """
+    t statistic and two-sided p-value of Welch's test that two samples
+    with possibly different variances have equal means
+    """
+    if len(a) < 2 or len(b) < 2:
+        raise ValueError('Every sample needs at least two values')
+    mean_a, mean_b = sum(a) / len(a), sum(b) / len(b)
+    error_a = sum((x - mean_a) ** 2 for x in a) / (len(a) - 1) / len(a)
+    error_b = sum((x - mean_b) ** 2 for x in b) / (len(b) - 1) / len(b)
+    if error_a + error_b == 0:
+        if mean_a == mean_b:
+            return 0.0, 1.0
+        return copysign(inf, mean_a - mean_b), 0.0
+    t = (mean_a - mean_b) / sqrt(error_a + error_b)
+    df = (error_a + error_b) ** 2 / (error_a ** 2 / (len(a) - 1)
+                                     + error_b ** 2 / (len(b) - 1))
+    return t, 2 * student_t_sf(abs(t), df)
+
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta function I_x(a, b)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1 - _incomplete_beta(b, a, 1 - x)
+    front = exp(lgamma(a + b) - lgamma(a) - lgamma(b)
+                + a * log(x) + b * log(1 - x))
+    return front * _beta_continued_fraction(a, b, x) / a
+
+
+def _beta_continued_fraction(a: float, b: float, x: float) -> float:
+    # modified Lentz's method
+    tiny = 1e-300
+    c = 1.0
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 1000):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x
+                          / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return fraction
+
+
+def kept_times(measurement: Measurement) -> list[float]:
+    outliers = set(measurement.outliers)
+    return [t for i, t in enumerate(measurement.times) if i not in outliers]
+
+
+def find_outliers(time_list: list) -> list[int]:
+    """Indexes of the times outside of Tukey's fences"""
+    if len(time_list) < 4:
+        return []
+    ordered = sorted(time_list)
+    q1 = _quantile(ordered, 0.25)
+    q3 = _quantile(ordered, 0.75)
+    low = q1 - 1.5 * (q3 - q1)
+    high = q3 + 1.5 * (q3 - q1)
+    return [i for i, t in enumerate(time_list) if not low <= t <= high]
+
+
+def _quantile(ordered: list, q: float) -> float:
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def time_calls(call: Callable[[], object], loops: int) -> int:
+    """
+    Nanoseconds spent by loops calls. The garbage collector is
+    disabled inside the timed region, so a collection triggered by
+    earlier allocations does not land in one of the samples
+    """
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        start_time = perf_counter_ns()
+        for _ in range(loops):
+            call()
+        return perf_counter_ns() - start_time
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def warm_up(call: Callable[[], object],
+            max_warm_ups: int = MAX_WARM_UPS,
+            tolerance: float = WARM_UP_TOLERANCE) -> int:
+    """
+    Calls until two consecutive calls take the same time within
+    the tolerance and returns the time of the last call
+    """
+    previous = time_calls(call, 1)
+    for _ in range(max_warm_ups - 1):
+        current = time_calls(call, 1)
+        if abs(current - previous) <= tolerance * previous:
+            return current
+        previous = current
+    return previous
+
+
+def calibrate_loops(call_time: int,
+                    min_sample_time: int = MIN_SAMPLE_TIME_NS) -> int:
+    """Calls per sample so that a sample lasts at least min_sample_time"""
+    return max(1, ceil(min_sample_time / max(call_time, 1)))
+
+
+def measure_finder(finder: Callable[[str, str], Union[tuple, int]],
+                   haystack: str, needle: str, case: str, repeats: int,
+                   min_sample_time: int = MIN_SAMPLE_TIME_NS) -> Measurement:
+    def call():
+        return finder(haystack, needle)
+
+    loops = calibrate_loops(warm_up(call), min_sample_time)
+    time_of_work = [time_calls(call, loops) / loops / 1e9
+                    for _ in range(repeats)]
+    return Measurement(case, finder.__name__, time_of_work,
+                       find_outliers(time_of_work), loops)
+
+
+def measure_memory(call: Callable[[], object]) -> int:
+    """
+    Peak of the memory traced by tracemalloc during the call above
+    the memory traced before it, in bytes
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        gc.collect()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        call()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return max(peak, 0)
+
+
 def determine_pattern_for_string(patterns: list[Pattern], data: str) \
         -> Union[PatternContent, None]:
     for i in range(len(patterns)):
@@ -42,6 +229,69 @@ def determine_pattern_for_string(patterns: list[Pattern], data: str) \
     return None
 
 
+class ResultsStore:
+    """
+    Measurements saved as JSON, one object per finder and test case,
+    or as CSV, one row per sample, depending on the file extension
+    """
+    _csv_fields = ['case', 'name', 'sample', 'time', 'outlier', 'loops',
+                   'peak_memory', 'operations']
+
+    def __init__(self, path: str):
+        self.path = path
+        self.format = os.path.splitext(path)[1].lower().lstrip('.')
+        if self.format not in ('json', 'csv'):
+            raise ValueError(f'Unsupported results format: {path}')
+
+    def save(self, measurements: list[Measurement]) -> None:
+        with open(self.path, encoding='utf-8', mode='w', newline='') as f:
+            if self.format == 'json':
+                json.dump([e._asdict() for e in measurements], f, indent=1,
+                          ensure_ascii=False)
+                return
+            writer = csv.writer(f)
+            writer.writerow(self._csv_fields)
+            for e in measurements:
+                outliers = set(e.outliers)
+                for i, t in enumerate(e.times):
+                    writer.writerow([e.case, e.name, i, repr(t),
+                                     int(i in outliers), e.loops,
+                                     _optional(e.peak_memory),
+                                     json.dumps(e.operations)])
+
+    def load(self) -> list[Measurement]:
+        with open(self.path, encoding='utf-8', newline='') as f:
+            if self.format == 'json':
+                return [_as_measurement(e) for e in json.load(f)]
+            measurements = {}
+            for row in csv.DictReader(f):
+                key = row['case'], row['name']
+                if key not in measurements:
+                    measurements[key] = Measurement(
+                        *key, [], [], int(row['loops']),
+                        _optional_int(row.get('peak_memory')),
+                        json.loads(row.get('operations') or 'null'))
+                measurement = measurements[key]
+                if int(row['outlier']):
+                    measurement.outliers.append(len(measurement.times))
+                measurement.times.append(float(row['time']))
+            return list(measurements.values())
+
+
+def _as_measurement(fields: dict) -> Measurement:
+    """Skips the fields of measurements saved by older versions"""
+    return Measurement(**{k: v for k, v in fields.items()
+                          if k in Measurement._fields})
+
+
+def _optional(value: Union[int, None]) -> str:
+    return '' if value is None else str(value)
+
+
+def _optional_int(value: Union[str, None]) -> Union[int, None]:
+    return int(value) if value else None
+
+
 class Point:
     def __init__(self, name: str, x: float, y: float, amplitude: float):
         self.name = name
@@ -66,44 +316,229 @@ class Point:
         return f'{self.name}\nx: {self.x}, y: {self.y}, amplitude: {self.amplitude}'
 
 
+class ResultsCache:
+    """
+    Measurements of single benchmark cells in a directory, one JSON
+    file per cell key. Every file is written to a temporary name and
+    renamed, so an interrupted run leaves only complete entries and
+    the next run resumes from them
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Measurement]:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return _as_measurement(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, measurement: Measurement) -> None:
+        path = self._path(key)
+        with open(f'{path}.tmp', encoding='utf-8', mode='w') as f:
+            json.dump(measurement._asdict(), f, ensure_ascii=False)
+        os.replace(f'{path}.tmp', path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+
+def cell_key(finder: Callable[[str, str], Union[tuple, int]],
+             text_digest: str, needle: str, case: str, repeats: int,
+             min_sample_time: int, operations: bool) -> str:
+    """
+    Hash of everything a measurement depends on: the sources of the
+    module of the finder and of every project module it imports,
+    directly or not, and the versions of Python and NumPy
+    """
+    data = [_dependency_sources(finder.__module__), sys.version,
+            _numpy_version(), finder.__module__, finder.__qualname__,
+            text_digest, needle, case, str(repeats), str(min_sample_time),
+            str(operations)]
+    return hashlib.sha256('\0'.join(data).encode('utf-8',
+                                               errors='surrogatepass')
+                          ).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _dependency_sources(module_name: str) -> str:
+    """
+    Sources of the module and of the modules of the same directory,
+    that is of the project, which it imports directly or not
+    """
+    module = sys.modules[module_name]
+    try:
+        path = inspect.getsourcefile(module)
+    except TypeError:
+        path = None
+    if path is None:
+        return ''
+    directory = os.path.dirname(os.path.abspath(path))
+    sources = {}
+    pending = [os.path.abspath(path)]
+    while pending:
+        path = pending.pop()
+        if path in sources:
+            continue
+        with open(path, encoding='utf-8') as f:
+            sources[path] = f.read()
+        for node in ast.walk(ast.parse(sources[path])):
+            if isinstance(node, ast.Import):
+                names = [e.name for e in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                candidate = os.path.join(directory,
+                                         name.split('.')[0] + '.py')
+                if os.path.exists(candidate):
+                    pending.append(candidate)
+    return '\0'.join(sources[e] for e in sorted(sources))
+
+
+def _numpy_version() -> str:
+    try:
+        return importlib.metadata.version('numpy')
+    except importlib.metadata.PackageNotFoundError:
+        return ''
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 class Tester:
+    """
+    Times every finder on every test case. Each finder is warmed up
+    until its timing settles, then every sample runs the finder enough
+    times to last at least min_sample_time nanoseconds, so that short
+    calls are not lost in the resolution of the clock. Samples outside
+    of Tukey's fences are marked as outliers. times are in seconds
+    per call.
+    A separate pass under tracemalloc, which slows the finder down and
+    is therefore never timed, records the peak memory of
+    a call that starts with empty table caches. With count_operations
+    another untimed pass records the operation counts of a call of
+    the instrumented engines of substring_finder.
+    Every (finder, text, needle) cell is independent: cells can run in
+    a pool of processes, each optionally pinned to its own core, and
+    with a cache directory a cell is measured again only when its
+    input, the project modules its finder imports or the versions
+    of Python and NumPy change
+    """
+
     def __init__(self,
                  functions: list[Callable[[str, str], Union[tuple, int]]],
                  comparing_parameters: list[tuple[str, str, str]],
                  repeats: int,
-                 path_to_save: str):
+                 path_to_save: str,
+                 min_sample_time: int = MIN_SAMPLE_TIME_NS,
+                 cache_directory: Optional[str] = None,
+                 count_operations: bool = False):
         self._comparing_parameters = comparing_parameters
         self._repeats = repeats
         self._functions = functions
+        self._min_sample_time = min_sample_time
+        self._count_operations = count_operations
         self.path_to_save = path_to_save
+        self.results = ResultsStore(path_to_save)
+        self.cache = ResultsCache(cache_directory) \
+            if cache_directory is not None else None
 
-    def test(self):
-        stats = []
-        for text_path, test_substring, statistic_name in self._comparing_parameters:
-            with open(text_path, encoding="utf-8") as f:
-                stats.append(
-                    self._get_base_statistics(f.read(), test_substring,
-                                              statistic_name))
-        return stats
-
-    def _get_base_statistics(
-            self, test_text: str, test_substring: str, statistic_name: str
-    ) -> list[str]:
-        save_intermediate_results(statistic_name, 'a', self.path_to_save)
-        statistics = [statistic_name]
-        for finder in self._functions:
-            finder(test_text, test_substring)
+    def test(self, workers: int = 1, pin_cores: bool = False,
+             use_cache: bool = True) -> list[Measurement]:
+        """
+        Measures every cell. With use_cache=False every cell is
+        measured again, and the cache is only refreshed
+        """
+        cells = [(finder, text_path, test_substring, statistic_name)
+                 for text_path, test_substring, statistic_name
+                 in self._comparing_parameters
+                 for finder in self._functions]
+        digests = {e[1]: file_digest(e[1]) for e in cells}
+        keys = [cell_key(finder, digests[text_path], test_substring,
+                         statistic_name, self._repeats, self._min_sample_time,
+                         self._count_operations)
+                for finder, text_path, test_substring, statistic_name in cells]
+        measurements = [self.cache.get(key) if self.cache and use_cache
+                        else None for key in keys]
+        missing = [i for i, e in enumerate(measurements) if e is None]
+        for i, measurement in self._run_cells([cells[i] for i in missing],
+                                              missing, workers, pin_cores):
+            measurements[i] = measurement
+            if self.cache:
+                self.cache.put(keys[i], measurement)
+        self.results.save(measurements)
+        return measurements
+
+    def _run_cells(self, cells: list[tuple], indexes: list[int],
+                   workers: int, pin_cores: bool) -> Iterator[tuple]:
+        if workers <= 1 or len(cells) <= 1:
+            for i, cell in zip(indexes, cells):
+                yield i, _measure_cell(*cell, self._repeats,
+                                       self._min_sample_time,
+                                       self._count_operations)
+            return
+        cores = _cores_to_pin(workers) if pin_cores else None
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_pin_worker,
+                                 initargs=(cores,)) as executor:
+            futures = {executor.submit(_measure_cell, *cell, self._repeats,
+                                       self._min_sample_time,
+                                       self._count_operations): i
+                       for i, cell in zip(indexes, cells)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def _measure_cell(finder: Callable[[str, str], Union[tuple, int]],
+                  text_path: str, test_substring: str, statistic_name: str,
+                  repeats: int, min_sample_time: int,
+                  operations: bool) -> Measurement:
+    test_text = _read_text(text_path)
+    measurement = measure_finder(finder, test_text, test_substring,
+                                 statistic_name, repeats, min_sample_time)
+    purge()
+    peak_memory = measure_memory(lambda: finder(test_text, test_substring))
+    measurement = measurement._replace(peak_memory=peak_memory)
+    if operations and finder in INSTRUMENTED_ENGINES:
+        with count_operations() as counts:
             finder(test_text, test_substring)
-            time_of_work = []
-            for _ in range(self._repeats):
-                start_time = default_timer()
-                finder(test_text, test_substring)
-                end_time = default_timer()
-                time_of_work.append(end_time - start_time)
-            statistics.append(f'{(sum(time_of_work) / self._repeats):0.6f}')
-            save_intermediate_results(str([finder.__name__] + time_of_work),
-                                      'a', self.path_to_save)
-        return statistics
+        measurement = measurement._replace(operations=counts._asdict())
+    return measurement
+
+
+@lru_cache(maxsize=1)
+def _read_text(text_path: str) -> str:
+    with open(text_path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _cores_to_pin(workers: int):
+    if not hasattr(os, 'sched_setaffinity'):
+        return None
+    cores = multiprocessing.Queue()
+    for core in sorted(os.sched_getaffinity(0))[:workers]:
+        cores.put(core)
+    return cores
+
+
+def _pin_worker(cores) -> None:
+    """Pins the worker process to a core nobody else took"""
+    if cores is None:
+        return
+    try:
+        core = cores.get_nowait()
+    except queue.Empty:
+        return
+    os.sched_setaffinity(0, {core})
 
 
 class GraphBuilder:
@@ -128,6 +563,29 @@ class GraphBuilder:
         figure.savefig(self.path_to_save)
         figure.show()
 
+    def build_scaling_graphs(self):
+        """
+        Log-log scaling curve of every finder, where point.x is
+        the size which varies across the sweep
+        """
+        grid_size = self.get_grid_size(len(self._data.keys()))
+        figure = plt.figure(figsize=(40, 30))
+        for current_number, (key, points) in enumerate(self._data.items(), 1):
+            ax = figure.add_subplot(*grid_size, current_number)
+            ax.set_title(key, fontsize=30)
+            ax.set_xscale('log')
+            ax.set_yscale('log')
+            curves = defaultdict(list)
+            for point in points:
+                curves[point.name].append(point)
+            for name, curve in curves.items():
+                ax.errorbar([p.x for p in curve], [p.y for p in curve],
+                            yerr=[p.amplitude for p in curve], marker='o',
+                            label=name)
+            ax.legend(fontsize=20)
+        figure.savefig(self.path_to_save)
+        figure.show()
+
     @staticmethod
     def get_grid_size(number: int) -> tuple[int, int]:
         x = y = round(sqrt(number))
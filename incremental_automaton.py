@@ -0,0 +1,178 @@
+from substring_finder import Text, _as_buffer
+from typing import Union, Iterator, Hashable, Optional
+from threading import Lock
+
+
+class IncrementalAutomaton:
+    """
+    Aho-Corasick automaton over a changing set of words.
+    add and remove patch failure links and dictionary suffix links only
+    around the changed trie path: every state keeps the states whose
+    failure link points to it, grouped by their last character, so the
+    states that must move to a new state are looked up instead of
+    recomputed from the root. Words and haystacks are either both str
+    or both bytes-like.
+    Updates are serialized by a lock and a new state is attached to the
+    trie only after its links are set, so other threads can keep
+    searching while the dictionary changes
+    """
+
+    def __init__(self, words: Optional[list] = None):
+        self._root = State(None, None)
+        self._ids = {}
+        self._next_id = 0
+        self._lock = Lock()
+        for word in words or ():
+            self.add(word)
+
+    def add(self, word: Union[str, bytes]) -> int:
+        """Adds the word, if it is new, and returns its id"""
+        with self._lock:
+            if word in self._ids:
+                return self._ids[word]
+            state = self._root
+            for char in word:
+                child = state.children.get(char)
+                if child is None:
+                    child = self._add_state(state, char)
+                state = child
+            self._ids[word] = state.word_id = self._next_id
+            self._next_id += 1
+            self._set_output(state, state)
+            return state.word_id
+
+    def remove(self, word: Union[str, bytes]):
+        with self._lock:
+            if word not in self._ids:
+                raise KeyError(word)
+            del self._ids[word]
+            state = self._find_state(word)
+            state.word_id = None
+            self._set_output(state, state.output)
+            while state is not self._root and not state.children \
+                    and state.word_id is None:
+                parent = state.parent
+                self._remove_state(state)
+                state = parent
+
+    def find(self, haystack: Text) -> Union[tuple, int]:
+        return next(self.finditer(haystack), -1)
+
+    def finditer(self, haystack: Text,
+                 overlapping: bool = True) -> Iterator[tuple]:
+        """
+        Yields the span of the longest word ending at every position
+        where some word ends, like AC_finditer
+        """
+        if not isinstance(haystack, str):
+            haystack = _as_buffer(haystack)
+        state = self._root
+        counter = 0
+        for e in haystack:
+            counter += 1
+            state = self._step(state, e)
+            match = state if state.word_id is not None else state.output
+            if match is not None:
+                yield counter - match.depth, counter
+                if not overlapping:
+                    state = self._root
+
+    def findall(self, haystack: Text, overlapping: bool = True) -> list[tuple]:
+        return list(self.finditer(haystack, overlapping))
+
+    def batch_finditer(self, haystack: Text) -> Iterator[tuple]:
+        """
+        Yields (word_id, start, end) for every occurrence of every word
+        in the order of AC_batch_finditer
+        """
+        if not isinstance(haystack, str):
+            haystack = _as_buffer(haystack)
+        state = self._root
+        counter = 0
+        for e in haystack:
+            counter += 1
+            state = self._step(state, e)
+            match = state if state.word_id is not None else state.output
+            while match is not None:
+                yield match.word_id, counter - match.depth, counter
+                match = match.output
+
+    def __contains__(self, word: Union[str, bytes]) -> bool:
+        return word in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _step(self, state: 'State', char: Hashable) -> 'State':
+        child = state.children.get(char)
+        while child is None and state is not self._root:
+            state = state.fail
+            child = state.children.get(char)
+        return state if child is None else child
+
+    def _add_state(self, parent: 'State', char: Hashable) -> 'State':
+        state = State(parent, char)
+        fail = parent.fail
+        while fail is not None and char not in fail.children:
+            fail = fail.fail
+        fail = self._root if fail is None else fail.children[char]
+        state.fail = fail
+        state.output = fail if fail.word_id is not None else fail.output
+        fail.fail_children.setdefault(char, set()).add(state)
+        for other in list(fail.fail_children[char]):
+            if other is not state and other.ends_with(state):
+                fail.fail_children[char].discard(other)
+                other.fail = state
+                state.fail_children.setdefault(char, set()).add(other)
+        parent.children[char] = state
+        return state
+
+    def _remove_state(self, state: 'State'):
+        del state.parent.children[state.char]
+        fail = state.fail
+        fail.fail_children[state.char].discard(state)
+        for char, others in state.fail_children.items():
+            for other in others:
+                other.fail = fail
+            fail.fail_children.setdefault(char, set()).update(others)
+
+    def _find_state(self, word: Union[str, bytes]) -> 'State':
+        state = self._root
+        for char in word:
+            state = state.children[char]
+        return state
+
+    @staticmethod
+    def _set_output(state: 'State', output: Optional['State']):
+        """
+        Points the dictionary suffix links of the states failing into
+        the state to output, down to the next state where a word ends
+        """
+        stack = [e for others in state.fail_children.values() for e in others]
+        while stack:
+            current = stack.pop()
+            current.output = output
+            if current.word_id is None:
+                stack.extend(e for others in current.fail_children.values()
+                             for e in others)
+
+
+class State:
+    def __init__(self, parent: Optional['State'], char: Hashable):
+        self.parent = parent
+        self.char = char
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.word_id = None
+        self.children = {}
+        self.fail = None
+        self.output = None
+        self.fail_children = {}
+
+    def ends_with(self, other: 'State') -> bool:
+        """Whether the word of the other state is a suffix of this one"""
+        current = self
+        while other.parent is not None:
+            if current.char != other.char:
+                return False
+            current, other = current.parent, other.parent
+        return True
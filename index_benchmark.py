@@ -0,0 +1,60 @@
+from suffix_array import SuffixArray
+from timeit import default_timer
+import substring_finder
+import random
+import os
+
+
+def make_queries(haystack: str, number: int, seed: int = 0) -> list[str]:
+    """Substrings of the haystack mixed with needles which are absent"""
+    generator = random.Random(seed)
+    queries = []
+    for i in range(number):
+        length = generator.randint(4, 36)
+        start = generator.randrange(len(haystack) - length)
+        needle = haystack[start:start + length]
+        queries.append(needle if i % 4 else needle[::-1] + '\0')
+    return queries
+
+
+def measure(function, *args) -> float:
+    start_time = default_timer()
+    function(*args)
+    return default_timer() - start_time
+
+
+def run_batch(find, haystack: str, queries: list[str]):
+    for needle in queries:
+        find(haystack, needle)
+
+
+if __name__ == '__main__':
+    text_path = os.path.join(os.path.dirname(__file__), 'texts',
+                             'SmallDataWithoutRepeating.txt')
+    index_path = os.path.join(os.path.dirname(__file__),
+                              'SmallDataWithoutRepeating.sa')
+    with open(text_path, encoding='utf-8') as f:
+        text = f.read()
+    queries = make_queries(text, 500)
+
+    start = default_timer()
+    index = SuffixArray(text)
+    build_time = default_timer() - start
+    index.save(index_path)
+    load_time = measure(SuffixArray.load, index_path)
+    os.remove(index_path)
+
+    results = [
+        ('Suffix array',
+         measure(run_batch, lambda _, n: index.find(n), text, queries)),
+        ('Knuth-Morris-Pratt algorithm',
+         measure(run_batch, substring_finder.KMP_algorithm, text, queries)),
+        ('Boyer-Moore-Horspool algorithm',
+         measure(run_batch, substring_finder.BMH_algorithm, text, queries)),
+    ]
+    print(f'Index build: {build_time:0.6f}, load: {load_time:0.6f}')
+    print(f'|Finder|{len(queries)} queries|Per query|')
+    print('|-|-|-|')
+    for name, time_of_work in results:
+        print(f'|{name}|{time_of_work:0.6f}|'
+              f'{time_of_work / len(queries):0.6f}|')
@@ -1,15 +1,41 @@
 from report import Reporter
 import substring_finder
+import vectorized_finder
+import argparse
+import sys
 import os
 import re
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark report of the substring finders')
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help='store the results as the baseline')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='rerun the suite and compare it with the '
+                             'baseline instead of writing the report; '
+                             'exits with 1 on significant slowdowns')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='cells measured in parallel, each process '
+                             'pinned to its own core; parallel cells '
+                             'share caches and memory bandwidth, which '
+                             'adds noise to the timings')
+    parser.add_argument('--count-operations', action='store_true',
+                        help='also count the comparisons, shifts and '
+                             'failure links of a call in an untimed pass')
+    arguments = parser.parse_args()
+
     substring_finders = [
         substring_finder.brute_force,
         substring_finder.KMP_algorithm,
+        substring_finder.shift_or_algorithm,
         substring_finder.z_function_finder,
         substring_finder.BMH_algorithm,
+        substring_finder.hybrid_algorithm,
+        substring_finder.BM_algorithm,
+        substring_finder.two_way_algorithm,
         substring_finder.AC_algorithm,
+        vectorized_finder.vectorized_finder,
     ]
     comparing_parameters = [
         (
@@ -75,5 +101,15 @@ if __name__ == '__main__':
                        re.compile(r'(Small data without repeating)(.*)'),
                        re.compile(
                            r'(.*\brepeat\b.*)|(Substring contains few different letters)')]
-    reporter = Reporter(substring_finders, comparing_parameters, 51, groups_patterns)
-    reporter.generate_statistics()
+    reporter = Reporter(substring_finders, comparing_parameters, 51,
+                        groups_patterns,
+                        count_operations=arguments.count_operations)
+    if arguments.baseline:
+        verdict = reporter.check_regressions(
+            arguments.baseline, workers=arguments.jobs, pin_cores=True)
+        print(f'{verdict["slower"]} slower, {verdict["faster"]} faster, '
+              f'see regression.md and verdict.json')
+        sys.exit(0 if verdict['passed'] else 1)
+    reporter.generate_statistics(workers=arguments.jobs, pin_cores=True)
+    if arguments.save_baseline:
+        reporter.save_baseline(arguments.save_baseline)
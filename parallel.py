@@ -0,0 +1,164 @@
+from substring_finder import KMP_algorithm, MULTI_NEEDLE_ENGINES, finditer, \
+    _skip_overlapping
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Union, Callable, Optional
+import os
+
+MIN_SEGMENT_SIZE = 1 << 16
+
+
+def parallel_find(haystack: str, needle: Union[list, str],
+                  engine: Callable = KMP_algorithm,
+                  workers: Optional[int] = None,
+                  executor: Optional[Executor] = None) -> Union[tuple, int]:
+    """
+    Finds the first occurrence of the needle like the engine itself does,
+    searching segments of the haystack in a process pool
+    """
+    if engine not in MULTI_NEEDLE_ENGINES:
+        if len(haystack) < len(needle):
+            return -1
+        if len(needle) < 1:
+            return 0
+    matches = [e for e in _search(haystack, needle, engine, workers,
+                                  executor, first_only=True) if e]
+    if not matches:
+        return -1
+    return min(matches, key=lambda e: (e[1], e[0]))
+
+
+def parallel_findall(haystack: str, needle: Union[list, str],
+                     engine: Callable = KMP_algorithm,
+                     overlapping: bool = True,
+                     workers: Optional[int] = None,
+                     executor: Optional[Executor] = None) -> list[tuple]:
+    """
+    Finds every occurrence of the needle like substring_finder.findall,
+    searching segments of the haystack in a process pool.
+    The haystack is placed in shared memory once and the segments overlap
+    by the length of the longest needle minus one, so matches crossing
+    a segment border are found by the segment they start in
+    """
+    if engine not in MULTI_NEEDLE_ENGINES and len(needle) < 1:
+        return list(finditer(haystack, needle, engine, overlapping))
+    segments = _search(haystack, needle, engine, workers, executor,
+                       first_only=False)
+    if engine in MULTI_NEEDLE_ENGINES:
+        matches = _merge_longest_by_end(segments)
+        if not overlapping:
+            matches = _select_non_overlapping_needles(haystack, needle,
+                                                      matches)
+        return matches
+    matches = [e for segment in segments for e in segment]
+    return matches if overlapping else list(_skip_overlapping(matches))
+
+
+def _search(haystack: str, needle: Union[list, str], engine: Callable,
+            workers: Optional[int], executor: Optional[Executor],
+            first_only: bool) -> list:
+    workers = workers or os.cpu_count() or 1
+    overlap = _max_needle_length(needle) - 1
+    segment_size = max(-(-len(haystack) // workers), MIN_SEGMENT_SIZE)
+    bounds = [(start, min(start + segment_size, len(haystack)))
+              for start in range(0, len(haystack), segment_size)]
+    if len(bounds) <= 1:
+        return [_search_text(haystack, 0, len(haystack), needle, engine,
+                             first_only)]
+    data, encoding, width = _encode_fixed_width(haystack)
+    memory = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(bounds)))
+    try:
+        memory.buf[:len(data)] = data
+        del data
+        futures = [
+            executor.submit(_search_segment, memory.name, encoding, width,
+                            start, min(stop + overlap, len(haystack)), stop,
+                            needle, engine, first_only)
+            for start, stop in bounds
+        ]
+        return [future.result() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+        memory.close()
+        memory.unlink()
+
+
+def _search_segment(memory_name: str, encoding: str, width: int,
+                    start: int, stop: int, owned_stop: int,
+                    needle: Union[list, str], engine: Callable,
+                    first_only: bool):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        segment = bytes(memory.buf[start * width:stop * width]) \
+            .decode(encoding, errors='surrogatepass')
+    finally:
+        memory.close()
+    return _search_text(segment, start, owned_stop, needle, engine,
+                        first_only)
+
+
+def _search_text(text: str, offset: int, owned_stop: int,
+                 needle: Union[list, str], engine: Callable,
+                 first_only: bool):
+    matches = ((begin + offset, end + offset)
+               for begin, end in finditer(text, needle, engine)
+               if begin + offset < owned_stop)
+    if first_only:
+        return next(matches, None)
+    return list(matches)
+
+
+def _merge_longest_by_end(segments: list[list[tuple]]) -> list[tuple]:
+    starts = {}
+    for segment in segments:
+        for begin, end in segment:
+            starts[end] = min(begin, starts.get(end, begin))
+    return [(starts[end], end) for end in sorted(starts)]
+
+
+def _select_non_overlapping_needles(haystack: str, needles: Union[list, str],
+                                    matches: list[tuple]) -> list[tuple]:
+    """
+    Repeats the restart of Aho-Corasick after every match: when the longest
+    needle at some end overlaps the previous match a shorter one may fit
+    """
+    needles = sorted([needles] if isinstance(needles, str) else needles,
+                     key=len, reverse=True)
+    selected = []
+    end = 0
+    for begin, stop in matches:
+        if begin < end:
+            begin = next((stop - len(e) for e in needles
+                          if len(e) <= stop - end
+                          and haystack.startswith(e, stop - len(e))), None)
+            if begin is None:
+                continue
+        end = stop
+        selected.append((begin, stop))
+    return selected
+
+
+def _max_needle_length(needle: Union[list, str]) -> int:
+    if isinstance(needle, str):
+        return len(needle)
+    return max(map(len, needle), default=0)
+
+
+def _encode_fixed_width(text: str) -> tuple[bytes, str, int]:
+    """
+    The text in a fixed width encoding, so that character offsets map
+    to byte offsets. The width is found by the C encoders themselves:
+    the narrowest encoding that succeeds without surrogate pairs wins
+    """
+    try:
+        return text.encode('latin-1'), 'latin-1', 1
+    except UnicodeEncodeError:
+        pass
+    data = text.encode('utf-16-le', errors='surrogatepass')
+    if len(data) == 2 * len(text):
+        return data, 'utf-16-le', 2
+    return text.encode('utf-32-le', errors='surrogatepass'), 'utf-32-le', 4
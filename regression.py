@@ -0,0 +1,109 @@
+from helpers import Measurement, kept_times, welch_t_test
+from collections import namedtuple, Counter
+from typing import Optional
+import json
+
+SIGNIFICANCE = 0.01
+MIN_CHANGE = 0.05
+
+SLOWER = 'slower'
+FASTER = 'faster'
+UNCHANGED = 'unchanged'
+NEW = 'new'
+MISSING = 'missing'
+VERDICTS = (SLOWER, FASTER, UNCHANGED, NEW, MISSING)
+
+Comparison = namedtuple('Comparison',
+                        ['case', 'name', 'baseline_time', 'time', 'change',
+                         'p_value', 'verdict'])
+
+
+def compare(baseline: list[Measurement], current: list[Measurement],
+            significance: float = SIGNIFICANCE,
+            min_change: float = MIN_CHANGE) -> list[Comparison]:
+    """
+    Welch's t-test of the samples of every (test case, finder) cell
+    against the baseline, outliers excluded. A cell is slower or faster
+    when its p-value is below significance and its mean time changed
+    by at least min_change of the baseline mean, so that tiny but
+    consistent differences of long runs are not reported
+    """
+    previous = {(e.case, e.name): e for e in baseline}
+    comparisons = []
+    for measurement in current:
+        times = kept_times(measurement)
+        time = sum(times) / len(times)
+        old = previous.pop((measurement.case, measurement.name), None)
+        if old is None:
+            comparisons.append(Comparison(measurement.case, measurement.name,
+                                          None, time, None, None, NEW))
+            continue
+        old_times = kept_times(old)
+        baseline_time = sum(old_times) / len(old_times)
+        _, p_value = welch_t_test(times, old_times)
+        change = time / baseline_time - 1
+        verdict = UNCHANGED
+        if p_value < significance and abs(change) >= min_change:
+            verdict = SLOWER if change > 0 else FASTER
+        comparisons.append(Comparison(measurement.case, measurement.name,
+                                      baseline_time, time, change, p_value,
+                                      verdict))
+    for old in previous.values():
+        old_times = kept_times(old)
+        comparisons.append(Comparison(old.case, old.name,
+                                      sum(old_times) / len(old_times),
+                                      None, None, None, MISSING))
+    return comparisons
+
+
+def make_verdict(comparisons: list[Comparison]) -> dict:
+    """
+    Machine-readable result: the gate passes when no cell got
+    significantly slower
+    """
+    counts = Counter(e.verdict for e in comparisons)
+    return {'passed': counts[SLOWER] == 0,
+            **{e: counts[e] for e in VERDICTS},
+            'cells': [e._asdict() for e in comparisons]}
+
+
+def save_verdict(verdict: dict, path: str) -> None:
+    with open(path, encoding='utf-8', mode='w') as f:
+        json.dump(verdict, f, indent=1, ensure_ascii=False)
+
+
+def diff_report(comparisons: list[Comparison],
+                significance: float = SIGNIFICANCE,
+                min_change: float = MIN_CHANGE) -> str:
+    """
+    Markdown table of the cells, slowdowns first and then speedups,
+    both by the size of the change, with the significant changes in bold
+    """
+    order = {SLOWER: 0, FASTER: 1, NEW: 2, MISSING: 3, UNCHANGED: 4}
+    rows = sorted(comparisons, key=lambda e: (order[e.verdict],
+                                              -abs(e.change or 0)))
+    counts = Counter(e.verdict for e in comparisons)
+    report = [
+        f'### Regressions against the baseline '
+        f'(p < {significance}, change of at least {min_change:.0%})',
+        '',
+        ', '.join(f'{counts[e]} {e}' for e in VERDICTS),
+        '',
+        '|Test case|Finder|Baseline, s|Current, s|Change|p-value|Verdict|',
+        '|-|-|-|-|-|-|-|',
+    ]
+    for e in rows:
+        change = _optional_format(e.change, '{:+.1%}')
+        verdict = e.verdict
+        if verdict in (SLOWER, FASTER):
+            change, verdict = f'**{change}**', f'**{verdict}**'
+        report.append(
+            f'|{e.case}|{e.name}|{_optional_format(e.baseline_time)}'
+            f'|{_optional_format(e.time)}|{change}'
+            f'|{_optional_format(e.p_value, "{:.2g}")}|{verdict}|')
+    return '\n'.join(report)
+
+
+def _optional_format(value: Optional[float],
+                     pattern: str = '{:0.6f}') -> str:
+    return '-' if value is None else pattern.format(value)
@@ -1,73 +1,130 @@
-from helpers import Point, Tester, GraphBuilder, save_intermediate_results,\
-    calculate_confidence_interval, determine_pattern_for_string, \
+from helpers import Point, Tester, GraphBuilder, Measurement, \
+    ResultsStore, calculate_confidence_interval, \
+    determine_pattern_for_string, kept_times, student_t_quantile, \
     Documentation, TestingResult
-from typing import Union, Callable, Pattern
+from typing import Union, Callable, Pattern, Optional
 from collections import defaultdict
 from os import sep
+import regression
 import re
 
 
 class Reporter:
-    _alpha_dict = {6: 2.5706,
-                   11: 2.2281,
-                   16: 2.1314,
-                   21: 2.0860,
-                   26: 2.0555,
-                   31: 2.0423,
-                   36: 2.0301,
-                   41: 2.0211,
-                   51: 2.0086,
-                   101: 1.9840}
+    confidence_level = 0.95
 
     def __init__(self,
                  functions: list[Callable[[str, str], Union[tuple, int]]],
                  comparing_parameters: list[tuple[str, str, str]],
                  repetition: int,
-                 groups_patterns: list[Pattern] = None):
+                 groups_patterns: list[Pattern] = None,
+                 path_to_results: str = 'results.json',
+                 cache_directory: Optional[str] = 'benchmark_cache',
+                 count_operations: bool = False):
         for e in functions:
             if not hasattr(e, "__call__"):
                 raise TypeError(f"{e} is not a function")
-        if repetition not in self._alpha_dict:
+        if repetition < 2:
             raise ValueError(
-                f'You can only set the following repeat values\n'
-                f'{", ".join([str(x) for x in self._alpha_dict.keys()])}')
+                f'At least two repetitions are needed: {repetition}')
         self._tester = Tester(functions, comparing_parameters, repetition,
-                              'intermediate_results.txt')
+                              path_to_results,
+                              cache_directory=cache_directory,
+                              count_operations=count_operations)
         self._substring_finders = functions
         self._repetition = repetition
-        self._all_statistics = None
+        self._measurements = None
         self._groups_patterns = groups_patterns
 
-    def generate_statistics(self):
-        self._all_statistics = self._tester.test()
+    def generate_statistics(self, workers: int = 1, pin_cores: bool = False):
+        """
+        Measures the cells which are not in the cache yet, in a pool
+        of workers processes when workers > 1
+        """
+        self._measurements = self._tester.test(workers, pin_cores)
         self._generate_report_in_md_format()
-        self._compute_data_for_graphs()
         if self._groups_patterns:
             for data_class in self.parse_data_for_graphs(
-                    self._substring_finders,
-                    self._tester.path_to_save,
+                    self._measurements,
                     self._groups_patterns):
                 path_to_save = sep.join(['.', 'graphs', f'graph{id(data_class)}.png'])
                 graph_builder = GraphBuilder(data_class, path_to_save)
                 graph_builder.build_graphs()
+            for data_class in self.parse_memory_for_graphs(
+                    self._measurements,
+                    self._groups_patterns):
+                path_to_save = sep.join(
+                    ['.', 'graphs', f'memory_graph{id(data_class)}.png'])
+                graph_builder = GraphBuilder(data_class, path_to_save)
+                graph_builder.build_graphs()
+
+    def save_baseline(self, path_to_baseline: str):
+        """Stores the measurements of generate_statistics as the baseline"""
+        if self._measurements is None:
+            raise RuntimeError('generate_statistics was not called')
+        ResultsStore(path_to_baseline).save(self._measurements)
+
+    def check_regressions(self, path_to_baseline: str,
+                          path_to_verdict: str = 'verdict.json',
+                          path_to_report: str = 'regression.md',
+                          significance: float = regression.SIGNIFICANCE,
+                          min_change: float = regression.MIN_CHANGE,
+                          workers: int = 1, pin_cores: bool = False) -> dict:
+        """
+        Reruns the suite, bypassing the cache, and compares every cell
+        with the baseline. Writes the verdict as JSON and the diff report
+        as markdown, and returns the verdict
+        """
+        self._measurements = self._tester.test(workers, pin_cores,
+                                               use_cache=False)
+        comparisons = regression.compare(
+            ResultsStore(path_to_baseline).load(), self._measurements,
+            significance, min_change)
+        verdict = regression.make_verdict(comparisons)
+        regression.save_verdict(verdict, path_to_verdict)
+        with open(path_to_report, encoding='utf-8', mode='w') as f:
+            f.write(regression.diff_report(comparisons, significance,
+                                           min_change))
+        return verdict
 
     def _generate_report_in_md_format(self):
         finders_docs = [
             self.parse_documentation(e)
             for e in map(lambda x: x.__doc__, self._substring_finders)
         ]
-        report_data = [e for e in zip(*[e for e in finders_docs])]
+        report_data = [[cell.replace('|', '\\|') for cell in e]
+                       for e in zip(*[e for e in finders_docs])]
         report = [
             f'|Parameter name|{"|".join(report_data[0])}|',
             "|-" * (len(self._substring_finders) + 1) + "|",
             f'|Time complexity|{"|".join(report_data[1])}|',
             f'|Memory complexity|{"|".join(report_data[2])}|',
         ]
-        stats_lines = [f"|{'|'.join(e)}|" for e in self._all_statistics]
-        report.extend(stats_lines)
+        header = report[:2]
+        report.extend(self._stats_lines(
+            lambda e: f'{self.summarize(e).average_time:0.6f}'))
+        report.extend(['', '### Peak traced memory, bytes', ''] + header)
+        report.extend(self._stats_lines(lambda e: str(e.peak_memory)))
+        if any(e.operations for e in self._measurements):
+            report.extend(['', '### Comparisons / shifts / failure links',
+                           ''] + header)
+            report.extend(self._stats_lines(self._format_operations))
         with open("report.md", "w") as f:
             f.write("\n".join(report))
 
+    def _stats_lines(self,
+                     cell: Callable[[Measurement], str]) -> list[str]:
+        stats = {}
+        for e in self._measurements:
+            stats.setdefault(e.case, [e.case]).append(cell(e))
+        return [f"|{'|'.join(e)}|" for e in stats.values()]
+
+    @staticmethod
+    def _format_operations(measurement: Measurement) -> str:
+        if measurement.operations is None:
+            return '-'
+        return ' / '.join(str(measurement.operations[e]) for e in
+                          ('comparisons', 'shifts', 'failure_links'))
+
     @staticmethod
     def parse_documentation(doc: str) -> Documentation:
         name = re.search("(?<=Name:).+", doc)[0].strip()
@@ -76,74 +133,57 @@ class Reporter:
             0].strip()
         return Documentation(name, time_complexity, memory_complexity)
 
-    def _compute_data_for_graphs(self):
-        float_pattern = re.compile(r'\d+\.\d+')
-        function_name_pattern = re.compile("|".join(
-            map(lambda x: x.__name__, self._substring_finders)))
-        with open(self._tester.path_to_save, mode='r', encoding='utf-8') as f:
-            data = f.readlines()
-            for i in range(len(data)):
-                function_name = re.search(function_name_pattern, data[i])
-                if function_name is None:
-                    continue
-                time_list = [float(x) for x in
-                             re.findall(float_pattern, data[i])]
-                confidence_interval = calculate_confidence_interval(
-                    self._alpha_dict[self._repetition], self._repetition,
-                    time_list)
-                average_time_of_work = sum(time_list) / len(time_list)
-                data[i] \
-                    = '{} confidence interval: {}, average time: {}\n'.format(
-                    function_name[0], confidence_interval,
-                    average_time_of_work)
-        save_intermediate_results(data, 'w', self._tester.path_to_save)
+    @classmethod
+    def summarize(cls, measurement: Measurement) -> TestingResult:
+        """
+        Average time and confidence interval of the samples which
+        are not outliers
+        """
+        time_list = kept_times(measurement)
+        confidence_interval = calculate_confidence_interval(
+            cls.get_alpha(len(time_list)), len(time_list), time_list)
+        return TestingResult(measurement.name, confidence_interval,
+                             sum(time_list) / len(time_list))
+
+    @classmethod
+    def get_alpha(cls, repetition: int) -> float:
+        """Student coefficient of the interval of repetition samples"""
+        return student_t_quantile((1 + cls.confidence_level) / 2,
+                                  repetition - 1)
 
     @staticmethod
-    def parse_data_for_graphs(
-            substring_finders: list[Callable[[str, str], Union[tuple, int]]],
-            file_path: str,
-            groups_patterns: list[Pattern]):
-        confidence_interval_pattern = re.compile(
-            r'(?<=confidence interval:\s)[0-9.]+')
-        function_name_pattern = re.compile("|".join(
-            map(lambda x: x.__name__, substring_finders)))
-        average_time_pattern = re.compile(r'(?<=average time:\s)[0-9.]+')
+    def parse_data_for_graphs(measurements: list[Measurement],
+                              groups_patterns: list[Pattern]):
+        def point(measurement: Measurement) -> tuple[float, float]:
+            res = Reporter.summarize(measurement)
+            return res.average_time, res.confidence_interval
 
-        data_classes = [defaultdict() for _ in range(len(groups_patterns))]
-        current_group_name = None
-        current_group_number = None
-
-        with open(file_path, mode='r') as f:
-            for line in f:
-                group = determine_pattern_for_string(groups_patterns, line)
-                if group:
-                    current_group_name = group.content
-                    current_group_number = group.number
-                    continue
-                res = Reporter.parse_testing_results(line,
-                                                     function_name_pattern,
-                                                     confidence_interval_pattern,
-                                                     average_time_pattern)
-                current_dict = data_classes[current_group_number]
-                if not current_dict.get(current_group_name):
-                    current_dict[current_group_name] = []
-                current_dict[current_group_name].append(
-                    Point(name=res.name,
-                          x=len(current_dict[current_group_name]),
-                          y=res.average_time,
-                          amplitude=res.confidence_interval)
-                )
+        return Reporter._group_points(measurements, groups_patterns, point)
 
-        return data_classes
+    @staticmethod
+    def parse_memory_for_graphs(measurements: list[Measurement],
+                                groups_patterns: list[Pattern]):
+        return Reporter._group_points(measurements, groups_patterns,
+                                      lambda e: (e.peak_memory, 0))
 
     @staticmethod
-    def parse_testing_results(data: str,
-                              function_name_pattern: Pattern,
-                              confidence_interval_pattern: Pattern,
-                              average_time_pattern: Pattern) -> TestingResult:
-        name = re.search(function_name_pattern, data)[0].strip()
-        confidence_interval = \
-            re.search(confidence_interval_pattern, data)[0].strip()
-        average_time = re.search(average_time_pattern, data)[0].strip()
-        return TestingResult(name, float(confidence_interval),
-                             float(average_time))
+    def _group_points(measurements: list[Measurement],
+                      groups_patterns: list[Pattern],
+                      point: Callable[[Measurement], tuple[float, float]]):
+        data_classes = [defaultdict() for _ in range(len(groups_patterns))]
+        for measurement in measurements:
+            group = determine_pattern_for_string(groups_patterns,
+                                                 measurement.case)
+            if group is None:
+                continue
+            y, amplitude = point(measurement)
+            current_dict = data_classes[group.number]
+            if not current_dict.get(group.content):
+                current_dict[group.content] = []
+            current_dict[group.content].append(
+                Point(name=measurement.name,
+                      x=len(current_dict[group.content]),
+                      y=y,
+                      amplitude=amplitude)
+            )
+        return data_classes
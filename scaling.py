@@ -0,0 +1,149 @@
+from helpers import Point, GraphBuilder, measure_finder, time_calls
+from report import Reporter
+from typing import Callable, Union, Iterator
+from collections import namedtuple, defaultdict
+from math import log, exp
+import corpus
+import substring_finder
+import argparse
+import os
+
+SweepCase = namedtuple('SweepCase', ['title', 'x', 'haystack', 'needle'])
+Fit = namedtuple('Fit', ['title', 'name', 'exponent', 'coefficient'])
+
+DEFAULT_SIZES = [1 << e for e in range(10, 21, 2)]
+DEFAULT_NEEDLE_LENGTHS = [1 << e for e in range(1, 9)]
+MAX_CALL_TIME = 10.0
+
+
+def size_sweep(sizes: list[int], needle_length: int, alphabet_size: int = 26,
+               distribution: str = 'uniform', seed: int = 0) \
+        -> Iterator[SweepCase]:
+    """Haystacks of growing size with a needle taken from each of them"""
+    title = (f'{distribution.capitalize()} text, '
+             f'alphabet of {alphabet_size}, m = {needle_length}, time by n')
+    for size in sizes:
+        haystack = corpus.generate_text(size, alphabet_size, distribution,
+                                        seed)
+        yield SweepCase(title, size, haystack,
+                        corpus.random_needle(haystack, needle_length, seed))
+
+
+def needle_length_sweep(size: int, needle_lengths: list[int],
+                        alphabet_size: int = 26,
+                        distribution: str = 'uniform', seed: int = 0) \
+        -> Iterator[SweepCase]:
+    title = (f'{distribution.capitalize()} text, '
+             f'alphabet of {alphabet_size}, n = {size}, time by m')
+    haystack = corpus.generate_text(size, alphabet_size, distribution, seed)
+    for length in needle_lengths:
+        yield SweepCase(title, length, haystack,
+                        corpus.random_needle(haystack, length, seed))
+
+
+def adversarial_sweep(kind: str, size: int,
+                      needle_lengths: list[int]) -> Iterator[SweepCase]:
+    """Worst case inputs of a fixed size with needles of growing length"""
+    for length in needle_lengths:
+        yield SweepCase(f'{kind.capitalize()}, n = {size}, time by m',
+                        length, *corpus.ADVERSARIAL_CASES[kind](size, length))
+
+
+def run_sweep(functions: list[Callable[[str, str], Union[tuple, int]]],
+              cases: Iterator[SweepCase], repeats: int = 6,
+              max_call_time: float = MAX_CALL_TIME) -> dict[str, list[Point]]:
+    """
+    Measures every finder on every case. A finder whose single call
+    took longer than max_call_time is not measured on the rest
+    of the sweep, so slow engines do not stall sweeps up to 1 GB
+    """
+    data = defaultdict(list)
+    exhausted = set()
+    for case in cases:
+        for finder in functions:
+            if (case.title, finder) in exhausted:
+                continue
+            call_time = time_calls(lambda: finder(case.haystack, case.needle),
+                                   1) / 1e9
+            if call_time > max_call_time:
+                exhausted.add((case.title, finder))
+                data[case.title].append(
+                    Point(finder.__name__, case.x, call_time, 0))
+                continue
+            res = Reporter.summarize(measure_finder(
+                finder, case.haystack, case.needle, case.title, repeats))
+            data[case.title].append(Point(finder.__name__, case.x,
+                                          res.average_time,
+                                          res.confidence_interval))
+    return dict(data)
+
+
+def fit_power_law(points: list[Point]) -> tuple[float, float]:
+    """
+    Least squares fit of y = coefficient * x ** exponent
+    in logarithmic coordinates
+    """
+    xs = [log(p.x) for p in points]
+    ys = [log(p.y) for p in points]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    variance = sum((x - x_mean) ** 2 for x in xs)
+    if variance == 0:
+        raise ValueError('At least two different sizes are needed')
+    exponent = sum((x - x_mean) * (y - y_mean)
+                   for x, y in zip(xs, ys)) / variance
+    return exponent, exp(y_mean - exponent * x_mean)
+
+
+def fit_complexity(data: dict[str, list[Point]]) -> list[Fit]:
+    """Empirical exponent of every finder in every sweep"""
+    fits = []
+    for title, points in data.items():
+        curves = defaultdict(list)
+        for point in points:
+            curves[point.name].append(point)
+        for name, curve in curves.items():
+            if len({p.x for p in curve}) > 1:
+                fits.append(Fit(title, name, *fit_power_law(curve)))
+    return fits
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Scaling curves of the substring finders')
+    parser.add_argument('--max-size', type=int, default=DEFAULT_SIZES[-1],
+                        help='largest haystack, up to 1 << 30')
+    parser.add_argument('--alphabet-size', type=int, default=26)
+    parser.add_argument('--repeats', type=int, default=6)
+    arguments = parser.parse_args()
+
+    substring_finders = [
+        substring_finder.brute_force,
+        substring_finder.KMP_algorithm,
+        substring_finder.shift_or_algorithm,
+        substring_finder.z_function_finder,
+        substring_finder.BMH_algorithm,
+        substring_finder.hybrid_algorithm,
+        substring_finder.BM_algorithm,
+        substring_finder.two_way_algorithm,
+    ]
+    sizes = [1 << e for e in range(10, arguments.max_size.bit_length(), 2)]
+    adversarial_size = min(arguments.max_size, 1 << 16)
+    sweeps = [
+        size_sweep(sizes, 8, arguments.alphabet_size),
+        size_sweep(sizes, 8, arguments.alphabet_size, 'zipf'),
+        needle_length_sweep(sizes[-1], DEFAULT_NEEDLE_LENGTHS,
+                            arguments.alphabet_size),
+        size_sweep(sizes, 16, 2),
+    ] + [adversarial_sweep(kind, adversarial_size, DEFAULT_NEEDLE_LENGTHS)
+         for kind in corpus.ADVERSARIAL_CASES]
+
+    data = {}
+    for sweep in sweeps:
+        data.update(run_sweep(substring_finders, sweep, arguments.repeats))
+    path_to_save = os.path.join('.', 'graphs', 'scaling.png')
+    GraphBuilder(data, path_to_save).build_scaling_graphs()
+    print('|Sweep|Finder|Exponent|')
+    print('|-|-|-|')
+    for fit in fit_complexity(data):
+        print(f'|{fit.title}|{fit.name}|{fit.exponent:0.2f}|')
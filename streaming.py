@@ -0,0 +1,122 @@
+from substring_finder import KMP_algorithm, BMH_algorithm, AC_algorithm, \
+    prefix_function, d_function, build_AC_automaton, _AC_scan, \
+    _encode_needle, _skip_overlapping, _tables
+from typing import Union, Iterator, Callable, BinaryIO
+from mmap import mmap
+import itertools
+import os
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+Source = Union[str, os.PathLike, BinaryIO, mmap]
+
+
+def read_chunks(source: Source, chunk_size: int = DEFAULT_CHUNK_SIZE) \
+        -> Iterator[bytes]:
+    if chunk_size < 1:
+        raise ValueError(f'Chunk size must be positive: {chunk_size}')
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, mode='rb') as f:
+            yield from read_chunks(f, chunk_size)
+    elif isinstance(source, mmap):
+        for position in range(0, len(source), chunk_size):
+            yield source[position:position + chunk_size]
+    elif hasattr(source, 'read'):
+        chunk = source.read(chunk_size)
+        while chunk:
+            if isinstance(chunk, str):
+                raise TypeError('Streaming search needs a binary file')
+            yield chunk
+            chunk = source.read(chunk_size)
+    else:
+        raise TypeError(f"Can't read chunks from {type(source)}")
+
+
+def stream_finditer(source: Source, needle: Union[list, str, bytes],
+                    engine: Callable = KMP_algorithm,
+                    overlapping: bool = True,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[tuple]:
+    """
+    Yields (start, end) byte offsets of every occurrence of the needle in
+    a file, a binary file object or a mmap. The data is read in chunks of
+    chunk_size bytes and the state of the engine is carried across chunk
+    boundaries, so memory usage does not depend on the size of the file.
+    String needles are searched in UTF-8
+    """
+    if engine not in _stream_scanners:
+        raise ValueError(f'Engine does not support streaming: {engine}')
+    needle = _encode_needle(needle)
+    if engine is AC_algorithm:
+        needle = [needle] if isinstance(needle, bytes) else needle
+    elif len(needle) < 1:
+        raise ValueError('Needle must not be empty')
+    return _stream_scanners[engine](read_chunks(source, chunk_size),
+                                    needle, overlapping)
+
+
+def stream_find(source: Source, needle: Union[list, str, bytes],
+                engine: Callable = KMP_algorithm,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Union[tuple, int]:
+    return next(stream_finditer(source, needle, engine,
+                                chunk_size=chunk_size), -1)
+
+
+def _KMP_stream_scan(chunks: Iterator[bytes], needle: bytes,
+                     overlapping: bool) -> Iterator[tuple]:
+    pi = prefix_function(needle)
+    offset = 0
+    j = 0
+    for chunk in chunks:
+        i = 0
+        while i < len(chunk):
+            if chunk[i] == needle[j]:
+                i += 1
+                j += 1
+                if j == len(needle):
+                    yield offset + i - len(needle), offset + i
+                    j = pi[j - 1] if overlapping else 0
+            elif j != 0:
+                j = pi[j - 1]
+            else:
+                i += 1
+        offset += len(chunk)
+
+
+def _BMH_stream_scan(chunks: Iterator[bytes], needle: bytes,
+                     overlapping: bool) -> Iterator[tuple]:
+    matches = _BMH_overlapping_stream_scan(chunks, needle)
+    return matches if overlapping else _skip_overlapping(matches)
+
+
+def _BMH_overlapping_stream_scan(chunks: Iterator[bytes], needle: bytes) \
+        -> Iterator[tuple]:
+    d = d_function(needle)
+    last = len(needle) - 1
+    offset = 0
+    tail = b''
+    for chunk in chunks:
+        window = tail + chunk
+        window_offset = offset - len(tail)
+        border = last
+        while border < len(window):
+            k = 0
+            while k <= last and window[border - k] == needle[last - k]:
+                k += 1
+            if k > last:
+                yield window_offset + border - last, window_offset + border + 1
+            border += d.get(window[border], len(needle))
+        tail = window[-last:] if last else b''
+        offset += len(chunk)
+
+
+def _AC_stream_scan(chunks: Iterator[bytes], needles: list,
+                    overlapping: bool) -> Iterator[tuple]:
+    return _AC_scan(itertools.chain.from_iterable(chunks), None,
+                    _tables.get(build_AC_automaton, needles), overlapping)
+
+
+_stream_scanners = {
+    KMP_algorithm: _KMP_stream_scan,
+    BMH_algorithm: _BMH_stream_scan,
+    AC_algorithm: _AC_stream_scan,
+}
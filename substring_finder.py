@@ -1,9 +1,87 @@
-from trie import Trie, Node
-from queue import Queue
-from typing import Union
+from trie import Trie
+from automaton import CompactAutomaton
+from collections import OrderedDict
+from contextlib import contextmanager
+from heapq import merge
+from typing import Union, Iterator, Callable, Hashable
+from mmap import mmap
+import copy
+import functools
+import sys
+import re
 
+Text = Union[str, bytes, bytearray, memoryview, mmap]
+Needles = Union[list, str, bytes]
 
-def brute_force(haystack: str, needle: str) -> Union[tuple, int]:
+_UTF8_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+_RK_BASE = 1000003
+_RK_MODULUS = (1 << 61) - 1
+_RARITY_SAMPLE_SIZE = 1 << 16
+
+_counts = None
+
+
+class _TableCache:
+    """
+    LRU cache of needle preprocessing tables. Its size is measured in
+    bytes of the tables, because an Aho-Corasick automaton grows with
+    its alphabet as well as with the needles
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._tables = OrderedDict()
+        self._size = 0
+
+    def get(self, builder: Callable, needle: Needles):
+        key = (builder, self._make_key(needle))
+        entry = self._tables.get(key)
+        if entry is not None:
+            self._tables.move_to_end(key)
+            return entry[0]
+        table = builder(needle)
+        size = self._measure(table)
+        if size <= self.max_size:
+            self._tables[key] = table, size
+            self._size += size
+            while self._size > self.max_size:
+                _, (_, evicted_size) = self._tables.popitem(last=False)
+                self._size -= evicted_size
+        return table
+
+    def clear(self):
+        self._tables.clear()
+        self._size = 0
+
+    def __len__(self):
+        return len(self._tables)
+
+    @staticmethod
+    def _make_key(needle: Needles) -> Hashable:
+        return needle if isinstance(needle, (str, bytes)) else tuple(needle)
+
+    @staticmethod
+    def _measure(table) -> int:
+        nbytes = getattr(table, 'nbytes', None)
+        if nbytes is not None:
+            return nbytes
+        size = sys.getsizeof(table)
+        if isinstance(table, dict):
+            table = [e for item in table.items() for e in item]
+        if isinstance(table, (list, tuple, set, frozenset)):
+            size += sum(_TableCache._measure(e) for e in table)
+        return size
+
+
+_tables = _TableCache(max_size=2 ** 26)
+
+
+def purge():
+    """Clears the cache of needle preprocessing tables"""
+    _tables.clear()
+
+
+def brute_force(haystack: Text, needle: Union[str, bytes]) -> Union[tuple, int]:
     """
     Name: Brute force
     Time complexity: O(len(haystack) * len(needle))
@@ -15,17 +93,30 @@ def brute_force(haystack: str, needle: str) -> Union[tuple, int]:
         return -1
     if len(needle) < 1:
         return 0
-    for i in range(len(haystack) - len(needle) + 1):
-        success = True
+    return next(_matcher(needle, brute_force).finditer(haystack), -1)
+
+
+def brute_force_finditer(haystack: Text, needle: Union[str, bytes],
+                         overlapping: bool = True) -> Iterator[tuple]:
+    return _matcher(needle, brute_force).finditer(haystack, overlapping)
+
+
+def _brute_force_scan(haystack: Text, needle: Union[str, bytes], _,
+                      overlapping: bool) -> Iterator[tuple]:
+    i = 0
+    while i <= len(haystack) - len(needle):
         for j in range(len(needle)):
             if haystack[i + j] != needle[j]:
-                success = False
-        if success:
-            return i, i + len(needle)
-    return -1
+                break
+        else:
+            yield i, i + len(needle)
+            if not overlapping:
+                i += len(needle)
+                continue
+        i += 1
 
 
-def KMP_algorithm(haystack: str, needle: str) -> Union[tuple, int]:
+def KMP_algorithm(haystack: Text, needle: Union[str, bytes]) -> Union[tuple, int]:
     """
     Name: Knuth-Morris-Pratt algorithm
     Explanation: https://www.youtube.com/watch?v=7g-WEBj3igk
@@ -38,20 +129,29 @@ def KMP_algorithm(haystack: str, needle: str) -> Union[tuple, int]:
         return -1
     if len(needle) < 1:
         return 0
-    pi = prefix_function(needle)
+    return next(_matcher(needle, KMP_algorithm).finditer(haystack), -1)
+
+
+def KMP_finditer(haystack: Text, needle: Union[str, bytes],
+                 overlapping: bool = True) -> Iterator[tuple]:
+    return _matcher(needle, KMP_algorithm).finditer(haystack, overlapping)
+
+
+def _KMP_scan(haystack: Text, needle: Union[str, bytes], pi: list,
+              overlapping: bool) -> Iterator[tuple]:
     i = 0
     j = 0
     while i < len(haystack):
-        if j == len(needle):
-            return i - len(needle), i
         if haystack[i] == needle[j]:
             i += 1
             j += 1
+            if j == len(needle):
+                yield i - len(needle), i
+                j = pi[j - 1] if overlapping else 0
         elif j != 0:
             j = pi[j - 1]
         else:
             i += 1
-    return -1
 
 
 def prefix_function(text: str) -> list:
@@ -71,12 +171,154 @@ def prefix_function(text: str) -> list:
     return pi
 
 
-def z_function_finder(haystack: str, needle: str, separator="$") -> Union[tuple, int]:
+def shift_or_algorithm(haystack: Text,
+                       needle: Union[str, bytes]) -> Union[tuple, int]:
+    """
+    Name: Shift-Or algorithm
+    Explanation: https://en.wikipedia.org/wiki/Bitap_algorithm
+    Time complexity: O(len(haystack) * len(needle) / w)
+    Memory complexity: O(|Σ|)
+    where w is the length of a machine word. The state of all prefixes
+    of the needle is kept in the bits of one integer, which is updated
+    with one shift and one or per character of the haystack
+    """
+    if len(haystack) < len(needle):
+        return -1
+    if len(needle) < 1:
+        return 0
+    return next(_matcher(needle, shift_or_algorithm).finditer(haystack), -1)
+
+
+def shift_or_finditer(haystack: Text, needle: Union[str, bytes],
+                      overlapping: bool = True) -> Iterator[tuple]:
+    return _matcher(needle, shift_or_algorithm).finditer(haystack, overlapping)
+
+
+def _shift_or_scan(haystack: Text, needle: Union[str, bytes], masks: dict,
+                   overlapping: bool) -> Iterator[tuple]:
+    m = len(needle)
+    full = (1 << m) - 1
+    found = 1 << (m - 1)
+    state = full
+    counter = 0
+    for e in haystack:
+        counter += 1
+        state = ((state << 1) | masks.get(e, full)) & full
+        if not state & found:
+            yield counter - m, counter
+            if not overlapping:
+                state = full
+
+
+def shift_or_masks(text: Union[str, bytes]) -> dict:
+    """Bit j of the mask of a character is 0 if text[j] is the character"""
+    full = (1 << len(text)) - 1
+    return {e: ~mask & full for e, mask in shift_and_masks(text).items()}
+
+
+def shift_and_masks(text: Union[str, bytes]) -> dict:
+    """Bit j of the mask of a character is 1 if text[j] is the character"""
+    masks = {}
+    for i, e in enumerate(text):
+        masks[e] = masks.get(e, 0) | (1 << i)
+    return masks
+
+
+def shift_or_fuzzy_finditer(haystack: Text, needle: Union[str, bytes],
+                            max_errors: int, edits: bool = False,
+                            overlapping: bool = True) -> Iterator[tuple]:
+    """
+    Approximate search in the style of Wu and Manber: one bit vector per
+    number of errors. Yields (start, end, errors) for every end position
+    of a substring at Hamming distance, or Levenshtein distance if edits
+    is True, of at most max_errors from the needle. errors is the
+    smallest distance at that end, and with edits the start is the
+    leftmost one reaching it
+    """
+    if max_errors < 0:
+        raise ValueError(f'Number of errors can not be negative: {max_errors}')
+    if not isinstance(haystack, str):
+        haystack, needle = _as_buffer(haystack), _encode_needle(needle)
+    if len(needle) < 1:
+        return _empty_needle_matches(haystack)
+    matches = _fuzzy_scan(haystack, needle,
+                          _tables.get(shift_and_masks, needle),
+                          min(max_errors, len(needle)), edits)
+    if not edits:
+        matches = ((end - len(needle), end, errors)
+                   for end, errors in matches)
+    else:
+        matches = ((_fuzzy_start(haystack, needle, end, errors), end, errors)
+                   for end, errors in matches)
+    if overlapping:
+        return matches
+    return _skip_overlapping(matches)
+
+
+def _fuzzy_scan(haystack: Text, needle: Union[str, bytes], masks: dict,
+                max_errors: int, edits: bool) -> Iterator[tuple]:
+    """Yields (end, errors); bit j of states[d] is whether needle[:j + 1]
+    ends here with at most d errors"""
+    full = (1 << len(needle)) - 1
+    found = 1 << (len(needle) - 1)
+    states = [(1 << d) - 1 if edits else 0 for d in range(max_errors + 1)]
+    counter = 0
+    for e in haystack:
+        counter += 1
+        mask = masks.get(e, 0)
+        previous_old = states[0]
+        states[0] = ((previous_old << 1) | 1) & mask
+        for d in range(1, max_errors + 1):
+            old = states[d]
+            state = (((old << 1) | 1) & mask) | (previous_old << 1) | 1
+            if edits:
+                state |= previous_old | (states[d - 1] << 1)
+            states[d] = state & full
+            previous_old = old
+        for d in range(max_errors + 1):
+            if states[d] & found:
+                yield counter, d
+                break
+
+
+def _fuzzy_start(haystack: Text, needle: Union[str, bytes], end: int,
+                 errors: int) -> int:
+    """Leftmost start of a substring ending at end within errors edits"""
+    begin = max(0, end - len(needle) - errors)
+    window = haystack[begin:end]
+    # distances[j]: from the needle suffix to the last j characters
+    distances = list(range(len(window) + 1))
+    for i in range(1, len(needle) + 1):
+        previous, distances[0] = distances[0], i
+        for j in range(1, len(window) + 1):
+            current = distances[j]
+            distances[j] = min(
+                current + 1, distances[j - 1] + 1,
+                previous + (needle[-i] != window[-j]))
+            previous = current
+    j = max(j for j in range(len(window) + 1) if distances[j] <= errors)
+    return end - j
+
+
+def _skip_overlapping(matches: Iterator[tuple]) -> Iterator[tuple]:
+    """Greedily keeps the matches starting after the end of the last kept"""
+    end = 0
+    for match in matches:
+        if match[0] >= end:
+            end = match[1]
+            yield match
+
+
+def z_function_finder(haystack: Text,
+                      needle: Union[str, bytes]) -> Union[tuple, int]:
     """
     Name: Algorithm using z function
     Explanation: https://youtu.be/BP9LXwosFco
     Time complexity: O(len(haystack) + len(needle))
-    Memory complexity: O(len(haystack) + len(needle))
+    Memory complexity: O(len(needle))
+    Only the z function of the needle is built. The haystack is scanned
+    with the rightmost window known to match a prefix of the needle,
+    as if it followed the needle, so no separator is needed
     Best case: SmallDataWithoutRepeating.txt when len(substring) is small
     Worst case: BeginningOfSubstringRepeatManyTimes.txt
     """
@@ -84,12 +326,30 @@ def z_function_finder(haystack: str, needle: str, separator="$") -> Union[tuple,
         return -1
     if len(needle) < 1:
         return 0
-    z = z_function(needle + separator + haystack)
-    try:
-        begin = z.index(len(needle)) - len(needle) - 1
-        return begin, begin + len(needle)
-    except ValueError:
-        return -1
+    return next(_matcher(needle, z_function_finder).finditer(haystack), -1)
+
+
+def z_function_finditer(haystack: Text, needle: Union[str, bytes],
+                        overlapping: bool = True) -> Iterator[tuple]:
+    return _matcher(needle, z_function_finder).finditer(haystack, overlapping)
+
+
+def _z_function_scan(haystack: Text, needle: Union[str, bytes], z: list,
+                     overlapping: bool) -> Iterator[tuple]:
+    m = len(needle)
+    # haystack[l:r] == needle[:r - l] for the rightmost such window
+    l = r = 0
+    next_begin = 0
+    for i in range(len(haystack) - m + 1):
+        k = min(z[i - l], r - i) if i < r else 0
+        if i + k >= r:
+            while k < m and haystack[i + k] == needle[k]:
+                k += 1
+            l, r = i, i + k
+        if k == m and i >= next_begin:
+            yield i, i + m
+            if not overlapping:
+                next_begin = i + m
 
 
 def z_function(text: str) -> list:
@@ -104,7 +364,7 @@ def z_function(text: str) -> list:
     return z
 
 
-def BMH_algorithm(haystack: str, needle: str) -> Union[tuple, int]:
+def BMH_algorithm(haystack: Text, needle: Union[str, bytes]) -> Union[tuple, int]:
     """
     Name: Boyer-Moore-Horspool algorithm
     Explanation: https://yandex.ru/video/preview/2201665387922285863
@@ -119,23 +379,30 @@ def BMH_algorithm(haystack: str, needle: str) -> Union[tuple, int]:
         return -1
     if len(needle) < 1:
         return 0
-    d = d_function(needle)
-    border = len(needle) - 1
-    k, m = 0, 1
-    while border < len(haystack):
-        while haystack[border - k] == needle[-m]:
-            m += 1
+    return next(_matcher(needle, BMH_algorithm).finditer(haystack), -1)
+
+
+def BMH_finditer(haystack: Text, needle: Union[str, bytes],
+                 overlapping: bool = True) -> Iterator[tuple]:
+    return _matcher(needle, BMH_algorithm).finditer(haystack, overlapping)
+
+
+def _BMH_scan(haystack: Text, needle: Union[str, bytes], d: dict,
+              overlapping: bool) -> Iterator[tuple]:
+    length = len(needle)
+    last = length - 1
+    border = last
+    end = len(haystack)
+    while border < end:
+        k = 0
+        while k <= last and haystack[border - k] == needle[last - k]:
             k += 1
-            if m == len(needle):
-                return border - len(needle) + 1, border + 1
-        else:
-            control_char = haystack[border] if k == 0 else needle[-1]
-            k, m = 0, 1
-            if control_char in d:
-                border += d[control_char]
-            else:
-                border += len(needle)
-    return -1
+        if k > last:
+            yield border - last, border + 1
+            if not overlapping:
+                border += length
+                continue
+        border += d.get(haystack[border], length)
 
 
 def d_function(text: str) -> dict:
@@ -151,68 +418,810 @@ def d_function(text: str) -> dict:
     return d
 
 
-def AC_algorithm(haystack: str, needles: Union[list, str]) -> Union[tuple, int]:
+def hybrid_algorithm(haystack: Text,
+                     needle: Union[str, bytes]) -> Union[tuple, int]:
+    """
+    Name: Knuth-Morris-Pratt algorithm with C-level skipping
+    Time complexity: O(len(haystack) + len(needle))
+    Memory complexity: O(len(needle))
+    Whenever no prefix of the needle is matched, str.find or bytes.find
+    jumps to the next occurrence of the needle character which is the
+    rarest in the haystack, so the interpreter runs KMP only near
+    plausible matches. Every character is scanned by find at most once
+    """
+    if len(haystack) < len(needle):
+        return -1
+    if len(needle) < 1:
+        return 0
+    return next(_matcher(needle, hybrid_algorithm).finditer(haystack), -1)
+
+
+def hybrid_finditer(haystack: Text, needle: Union[str, bytes],
+                    overlapping: bool = True) -> Iterator[tuple]:
+    return _matcher(needle, hybrid_algorithm).finditer(haystack, overlapping)
+
+
+def _hybrid_scan(haystack: Text, needle: Union[str, bytes], pi: list,
+                 overlapping: bool) -> Iterator[tuple]:
+    # the C scanners read the haystack itself and are not counted
+    data = haystack._data if isinstance(haystack, _CountingSequence) \
+        else haystack
+    anchor = _rarest_position(data, needle)
+    find = _char_search(data, needle[anchor])
+    i = 0
+    j = 0
+    while i < len(haystack):
+        if j == 0:
+            # a match starting at i has the anchor character at i + anchor
+            position = find(i + anchor)
+            if position < 0:
+                return
+            i = position - anchor
+        if haystack[i] == needle[j]:
+            i += 1
+            j += 1
+            if j == len(needle):
+                yield i - len(needle), i
+                j = pi[j - 1] if overlapping else 0
+        elif j != 0:
+            j = pi[j - 1]
+        else:
+            i += 1
+
+
+def _rarest_position(haystack: Text, needle: Union[str, bytes]) -> int:
+    """
+    Position in the needle of its character which is the least frequent
+    in the beginning of the haystack
+    """
+    if isinstance(haystack, str):
+        def count(e):
+            return haystack.count(e, 0, _RARITY_SAMPLE_SIZE)
+    else:
+        count = bytes(haystack[:_RARITY_SAMPLE_SIZE]).count
+    positions = {}
+    for i, e in enumerate(needle):
+        positions.setdefault(e, i)
+    return min(positions.values(), key=lambda i: count(needle[i]))
+
+
+def _char_search(haystack: Text, char: Union[str, int]) \
+        -> Callable[[int], int]:
+    """
+    Index of the first occurrence of the character at or after
+    a position, or -1. The memoryview, which has no find, is scanned
+    by the C code of re
+    """
+    if hasattr(haystack, 'find'):
+        find = haystack.find
+        return lambda start: find(char, start)
+    search = re.compile(re.escape(bytes([char]))).search
+
+    def search_char(start: int) -> int:
+        match = search(haystack, start)
+        return match.start() if match else -1
+    return search_char
+
+
+def BM_algorithm(haystack: Text,
+                 needle: Union[str, bytes]) -> Union[tuple, int]:
+    """
+    Name: Boyer-Moore algorithm
+    Explanation: https://en.wikipedia.org/wiki/Boyer-Moore_string-search_algorithm
+    Time complexity: O(len(haystack) + len(needle))
+    Memory complexity: O(len(needle))
+    Amortization time complexity: O(len(haystack) / len(needle))
+    Bad character and good suffix rules choose the shift, and the Galil
+    rule skips the part of the window which is known to match after
+    a shift by the period of the needle, so the worst case is linear
+    """
+    if len(haystack) < len(needle):
+        return -1
+    if len(needle) < 1:
+        return 0
+    return next(_matcher(needle, BM_algorithm).finditer(haystack), -1)
+
+
+def BM_finditer(haystack: Text, needle: Union[str, bytes],
+                overlapping: bool = True) -> Iterator[tuple]:
+    return _matcher(needle, BM_algorithm).finditer(haystack, overlapping)
+
+
+def _BM_scan(haystack: Text, needle: Union[str, bytes], tables: tuple,
+             overlapping: bool) -> Iterator[tuple]:
+    last_occurrence, good_suffix = tables
+    m = len(needle)
+    period = good_suffix[0]
+    s = 0
+    known = 0
+    while s <= len(haystack) - m:
+        j = m - 1
+        while j >= known and haystack[s + j] == needle[j]:
+            j -= 1
+        if j < known:
+            yield s, s + m
+            if overlapping:
+                s += period
+                known = m - period
+            else:
+                s += m
+                known = 0
+        else:
+            s += max(good_suffix[j + 1],
+                     j - last_occurrence.get(haystack[s + j], -1))
+            known = 0
+
+
+def BM_tables(text: Union[str, bytes]) -> tuple[dict, list]:
+    """
+    Last occurrence of every character and the strong good suffix shifts:
+    good_suffix[j] is the shift when text[j:] matched and text[j - 1]
+    did not, good_suffix[0] is the period of the text
+    """
+    last_occurrence = {e: i for i, e in enumerate(text)}
+    m = len(text)
+    good_suffix = [0] * (m + 1)
+    border = [0] * (m + 1)
+    i, j = m, m + 1
+    border[i] = j
+    while i > 0:
+        while j <= m and text[i - 1] != text[j - 1]:
+            if good_suffix[j] == 0:
+                good_suffix[j] = j - i
+            j = border[j]
+        i -= 1
+        j -= 1
+        border[i] = j
+    j = border[0]
+    for i in range(m + 1):
+        if good_suffix[i] == 0:
+            good_suffix[i] = j
+        if i == j:
+            j = border[j]
+    return last_occurrence, good_suffix
+
+
+def two_way_algorithm(haystack: Text,
+                      needle: Union[str, bytes]) -> Union[tuple, int]:
+    """
+    Name: Two-Way algorithm
+    Explanation: https://en.wikipedia.org/wiki/Two-way_string-matching_algorithm
+    Time complexity: O(len(haystack) + len(needle))
+    Memory complexity: O(1)
+    The needle is split at a critical factorization. The right part is
+    compared left to right and the left part right to left, and the
+    period of the needle bounds the comparisons repeated after a shift
+    """
+    if len(haystack) < len(needle):
+        return -1
+    if len(needle) < 1:
+        return 0
+    return next(_matcher(needle, two_way_algorithm).finditer(haystack), -1)
+
+
+def two_way_finditer(haystack: Text, needle: Union[str, bytes],
+                     overlapping: bool = True) -> Iterator[tuple]:
+    return _matcher(needle, two_way_algorithm).finditer(haystack, overlapping)
+
+
+def _two_way_scan(haystack: Text, needle: Union[str, bytes],
+                  factorization: tuple,
+                  overlapping: bool) -> Iterator[tuple]:
+    ell, period, periodic = factorization
+    m = len(needle)
+    if not periodic:
+        period = max(ell + 1, m - ell - 1) + 1
+    s = 0
+    memory = -1
+    while s <= len(haystack) - m:
+        i = max(ell, memory) + 1
+        while i < m and needle[i] == haystack[s + i]:
+            i += 1
+        if i < m:
+            s += i - ell
+            memory = -1
+            continue
+        i = ell
+        while i > memory and needle[i] == haystack[s + i]:
+            i -= 1
+        if i <= memory:
+            yield s, s + m
+            if not overlapping:
+                s += m
+                memory = -1
+                continue
+        s += period
+        memory = m - period - 1 if periodic else -1
+
+
+def critical_factorization(text: Union[str, bytes]) -> tuple[int, int, bool]:
+    """
+    Returns the last index of the left part of a critical factorization,
+    the period of the text and whether the left part repeats after one
+    period, which is when the search may remember matched characters
+    """
+    ell_less, period_less = _maximal_suffix(text, reverse=False)
+    ell_greater, period_greater = _maximal_suffix(text, reverse=True)
+    if ell_less > ell_greater:
+        ell, period = ell_less, period_less
+    else:
+        ell, period = ell_greater, period_greater
+    periodic = text[:ell + 1] == text[period:period + ell + 1]
+    return ell, period, periodic
+
+
+def _maximal_suffix(text: Union[str, bytes], reverse: bool) -> tuple[int, int]:
+    start, j, k, period = -1, 0, 1, 1
+    while j + k < len(text):
+        a, b = text[j + k], text[start + k]
+        if (a > b) if reverse else (a < b):
+            j += k
+            k = 1
+            period = j - start
+        elif a == b:
+            if k != period:
+                k += 1
+            else:
+                j += period
+                k = 1
+        else:
+            start = j
+            j = start + 1
+            k = period = 1
+    return start, period
+
+
+def AC_algorithm(haystack: Text, needles: Needles) -> Union[tuple, int]:
     """
     Name: Aho-Corasick algorithm
     Explanation: https://www.youtube.com/watch?v=-KCd8UUwU38
     Time complexity: O(len(needles) + len(haystack))
-    Memory complexity: O(len(needles))
+    Memory complexity: O(len(needles) * |Σ|)
     This version of the algorithm finds the first occurrence of one
     of the needles in the haystack
     """
-    trie = Trie(needles)
-    build_suffix_links(trie)
-    find_extra_terminal_nodes(trie)
-    alphabet = set("".join(needles))
-    state = trie.root
+    return next(_matcher(needles, AC_algorithm).finditer(haystack), -1)
+
+
+def AC_finditer(haystack: Text, needles: Needles,
+                overlapping: bool = True) -> Iterator[tuple]:
+    """
+    Yields the span of the longest needle ending at every position
+    where some needle ends
+    """
+    return _matcher(needles, AC_algorithm).finditer(haystack, overlapping)
+
+
+def _AC_scan(haystack: Text, _, automaton: CompactAutomaton,
+             overlapping: bool) -> Iterator[tuple]:
+    columns = automaton.columns
+    base = automaton.base
+    check = automaton.check
+    next_state = automaton.next
+    fail = automaton.fail
+    output = automaton.output
+    depth = automaton.depth
+    state = 0
     counter = 0
     for e in haystack:
         counter += 1
-        child = state.children.get(e)
-        state = state.suffix if child is None else child
-        if e not in alphabet or state is None:
-            state = trie.root
-            continue
-        if state.is_terminal:
-            return counter - get_depth_of_node(trie, state), counter
-    return -1
-
-
-def build_suffix_links(trie: Trie):
-    queue = Queue()
-    queue.put((trie.root, trie.root, None, None))
-    while not queue.empty():
-        e = queue.get()
-        current_element = e[0]
-        current_element.find_suffix(*e[1:])
-        if len(current_element.children) <= 0:
+        column = columns.get(e, 0)
+        while check[base[state] + column] != state:
+            state = fail[state]
+        state = next_state[base[state] + column]
+        match = output[state]
+        if match >= 0:
+            yield counter - depth[match], counter
+            if not overlapping:
+                state = 0
+
+
+def AC_batch_finditer(haystack: Text, needles: Needles) -> Iterator[tuple]:
+    """
+    Yields (needle_id, start, end) for every occurrence of every needle,
+    where needle_id is the index of the needle in needles. Matches are
+    ordered by their end and, for the same end, from the longest needle
+    """
+    if isinstance(needles, (str, bytes)):
+        needles = [needles]
+    if not isinstance(haystack, str):
+        haystack, needles = _as_buffer(haystack), _encode_needle(needles)
+    return _AC_batch_scan(haystack, _tables.get(build_AC_automaton, needles))
+
+
+def AC_batch_findall(haystack: Text, needles: Needles) -> list[list[tuple]]:
+    """Spans of all occurrences of each needle, indexed like needles"""
+    needle_count = 1 if isinstance(needles, (str, bytes)) else len(needles)
+    matches = [[] for _ in range(needle_count)]
+    for needle_id, start, end in AC_batch_finditer(haystack, needles):
+        matches[needle_id].append((start, end))
+    return matches
+
+
+def _AC_batch_scan(haystack: Text,
+                   automaton: CompactAutomaton) -> Iterator[tuple]:
+    columns = automaton.columns
+    base = automaton.base
+    check = automaton.check
+    next_state = automaton.next
+    fail = automaton.fail
+    output = automaton.output
+    output_link = automaton.output_link
+    word_ids = automaton.word_ids
+    depth = automaton.depth
+    state = 0
+    counter = 0
+    for e in haystack:
+        counter += 1
+        column = columns.get(e, 0)
+        while check[base[state] + column] != state:
+            state = fail[state]
+        state = next_state[base[state] + column]
+        match = output[state]
+        while match >= 0:
+            start = counter - depth[match]
+            for needle_id in word_ids[match]:
+                yield needle_id, start, counter
+            match = output_link[match]
+
+
+def AC_automaton_finditer(haystack: Text, automaton: CompactAutomaton,
+                          overlapping: bool = True) -> Iterator[tuple]:
+    """
+    AC_finditer with a prebuilt automaton, for example one mapped
+    by CompactAutomaton.load
+    """
+    haystack = _automaton_haystack(haystack, automaton)
+    return _AC_scan(haystack, None, automaton, overlapping)
+
+
+def AC_automaton_batch_finditer(haystack: Text,
+                                automaton: CompactAutomaton) -> Iterator[tuple]:
+    """AC_batch_finditer with a prebuilt automaton"""
+    haystack = _automaton_haystack(haystack, automaton)
+    return _AC_batch_scan(haystack, automaton)
+
+
+def _automaton_haystack(haystack: Text, automaton: CompactAutomaton) -> Text:
+    if isinstance(haystack, str):
+        if automaton.binary:
+            raise TypeError("Can't search for a binary needle in str")
+        return haystack
+    if not automaton.binary and automaton.columns:
+        raise TypeError("Can't search for str needles in a binary haystack, "
+                        "build the automaton from encoded needles")
+    return _as_buffer(haystack)
+
+
+def RK_algorithm(haystack: Text, needles: Needles) -> Union[tuple, int]:
+    """
+    Name: Rabin-Karp algorithm
+    Explanation: https://en.wikipedia.org/wiki/Rabin-Karp_algorithm
+    Time complexity: O(len(haystack) * number of needle lengths)
+    Memory complexity: O(number of needles)
+    Needles are grouped by length, and every group costs one pass of
+    a rolling hash over the haystack looked up in a set of needle
+    fingerprints. Finds the same occurrence as the Aho-Corasick algorithm
+    """
+    return next(_matcher(needles, RK_algorithm).finditer(haystack), -1)
+
+
+def RK_finditer(haystack: Text, needles: Needles,
+                overlapping: bool = True) -> Iterator[tuple]:
+    """
+    Yields the span of the longest needle ending at every position
+    where some needle ends
+    """
+    return _matcher(needles, RK_algorithm).finditer(haystack, overlapping)
+
+
+def RK_batch_finditer(haystack: Text, needles: Needles) -> Iterator[tuple]:
+    """
+    Yields (needle_id, start, end) for every occurrence of every needle
+    in the order of AC_batch_finditer
+    """
+    if isinstance(needles, (str, bytes)):
+        needles = [needles]
+    if not isinstance(haystack, str):
+        haystack, needles = _as_buffer(haystack), _encode_needle(needles)
+    return _RK_batch_scan(haystack, _tables.get(RK_tables, needles))
+
+
+def _RK_scan(haystack: Text, _, groups: list,
+             overlapping: bool) -> Iterator[tuple]:
+    last_end = 0
+    current_end = None
+    for _, start, end in _RK_batch_scan(haystack, groups):
+        if end == current_end or start < last_end:
             continue
-        for e in [
-            (value, trie.root, current_element, key)
-            for key, value in current_element.children.items()
-        ]:
-            queue.put(e)
-
-
-def find_extra_terminal_nodes(trie: Trie):
-    queue = Queue()
-    queue.put(trie.root)
-    while not queue.empty():
-        current = node = queue.get()
-        while not current.is_terminal and node.suffix:
-            current.is_terminal = node.suffix.is_terminal
-            node = node.suffix
-        for e in current.children.values():
-            queue.put(e)
-
-
-def get_depth_of_node(trie: Trie, node: Node):
-    queue = Queue()
-    queue.put((trie.root, 0))
-    while not queue.empty():
-        n, depth = queue.get()
-        if n is node:
-            return depth
-        for e in n.children.values():
-            queue.put((e, depth + 1))
-    return -1
+        current_end = end
+        yield start, end
+        if not overlapping:
+            last_end = end
+
+
+def _RK_batch_scan(haystack: Text, groups: list) -> Iterator[tuple]:
+    passes = [_RK_pass(haystack, length, fingerprints)
+              for length, fingerprints in groups]
+    return merge(*passes, key=lambda e: (e[2], e[1] - e[2], e[0]))
+
+
+def _RK_pass(haystack: Text, length: int,
+             fingerprints: dict) -> Iterator[tuple]:
+    if len(haystack) < length:
+        return
+    if isinstance(haystack, str):
+        incoming, outgoing = map(ord, haystack), map(ord, haystack)
+    else:
+        incoming, outgoing = iter(haystack), iter(haystack)
+    highest = pow(_RK_BASE, length - 1, _RK_MODULUS)
+    fingerprint = 0
+    for _ in range(length):
+        fingerprint = (fingerprint * _RK_BASE + next(incoming)) % _RK_MODULUS
+    start = 0
+    while True:
+        candidates = fingerprints.get(fingerprint)
+        if candidates is not None:
+            window = haystack[start:start + length]
+            for needle, needle_ids in candidates:
+                if window == needle:
+                    for needle_id in needle_ids:
+                        yield needle_id, start, start + length
+        code = next(incoming, None)
+        if code is None:
+            return
+        fingerprint = ((fingerprint - next(outgoing) * highest) * _RK_BASE
+                       + code) % _RK_MODULUS
+        start += 1
+
+
+def RK_tables(needles: Needles) -> list[tuple]:
+    """
+    Needle fingerprints grouped by needle length:
+    (length, {fingerprint: [(needle, needle ids)]})
+    """
+    if isinstance(needles, (str, bytes)):
+        needles = [needles]
+    ids = {}
+    for needle_id, needle in enumerate(needles):
+        ids.setdefault(needle, []).append(needle_id)
+    groups = {}
+    for needle, needle_ids in ids.items():
+        fingerprint = 0
+        for e in needle:
+            code = ord(e) if isinstance(e, str) else e
+            fingerprint = (fingerprint * _RK_BASE + code) % _RK_MODULUS
+        groups.setdefault(len(needle), {}) \
+            .setdefault(fingerprint, []).append((needle, tuple(needle_ids)))
+    return list(groups.items())
+
+
+def build_AC_automaton(needles: Needles) -> CompactAutomaton:
+    return CompactAutomaton(Trie(needles))
+
+
+def _empty_needle_matches(haystack: Text) -> Iterator[tuple]:
+    for i in range(len(haystack) + 1):
+        yield i, i
+
+
+def _is_text(needle: Needles) -> bool:
+    if isinstance(needle, str):
+        return True
+    if isinstance(needle, (bytes, bytearray, memoryview)):
+        return False
+    return all(isinstance(e, str) for e in needle)
+
+
+def _encode_needle(needle: Needles) -> Union[list, bytes]:
+    if isinstance(needle, str):
+        return needle.encode('utf-8')
+    if isinstance(needle, (bytes, bytearray, memoryview)):
+        return bytes(needle)
+    return [_encode_needle(e) for e in needle]
+
+
+def _as_buffer(haystack: Text) -> Union[bytes, bytearray, memoryview]:
+    """Byte oriented view of the haystack which is indexed by integers"""
+    if isinstance(haystack, (bytes, bytearray)):
+        return haystack
+    view = memoryview(haystack)
+    return view if view.format == 'B' and view.ndim == 1 else view.cast('B')
+
+
+_engines = {
+    brute_force: (None, _brute_force_scan),
+    KMP_algorithm: (prefix_function, _KMP_scan),
+    shift_or_algorithm: (shift_or_masks, _shift_or_scan),
+    z_function_finder: (z_function, _z_function_scan),
+    BMH_algorithm: (d_function, _BMH_scan),
+    hybrid_algorithm: (prefix_function, _hybrid_scan),
+    BM_algorithm: (BM_tables, _BM_scan),
+    two_way_algorithm: (critical_factorization, _two_way_scan),
+    AC_algorithm: (build_AC_automaton, _AC_scan),
+    RK_algorithm: (RK_tables, _RK_scan),
+}
+
+MULTI_NEEDLE_ENGINES = frozenset([AC_algorithm, RK_algorithm])
+ENGINES = {engine.__name__: engine for engine in _engines}
+
+
+class OperationCounts:
+    """
+    Operations counted inside count_operations:
+    comparisons - characters of the haystack read by the engine, every
+    character comparison reads one. The characters skipped by str.find
+    in hybrid_algorithm are not counted
+    shifts - lookups of the shift tables of BMH and BM
+    failure_links - failure links of KMP (pi) and failure and dictionary
+    suffix links of Aho-Corasick followed
+    """
+
+    def __init__(self):
+        self.comparisons = 0
+        self.shifts = 0
+        self.failure_links = 0
+
+    def _asdict(self) -> dict:
+        return dict(vars(self))
+
+    def __repr__(self):
+        return 'OperationCounts({})'.format(
+            ', '.join(f'{k}={v}' for k, v in vars(self).items()))
+
+
+@contextmanager
+def count_operations() -> Iterator[OperationCounts]:
+    """
+    Instrumentation mode for the searches made through Matcher, that is
+    every engine function, finditer and findall. Inside the block the
+    haystack and the tables are wrapped into counting proxies. Outside
+    of it nothing is wrapped, so the engines run at full speed
+    """
+    global _counts
+    counts = OperationCounts()
+    previous, _counts = _counts, counts
+    try:
+        yield counts
+    finally:
+        _counts = previous
+
+
+class _CountingSequence:
+    def __init__(self, data, counts: OperationCounts, field: str):
+        self._data = data
+        self._counts = vars(counts)
+        self._field = field
+
+    def __getitem__(self, index):
+        value = self._data[index]
+        self._counts[self._field] += \
+            len(value) if isinstance(index, slice) else 1
+        return value
+
+    def __iter__(self):
+        counts, field = self._counts, self._field
+        for e in self._data:
+            counts[field] += 1
+            yield e
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _CountingStr(str):
+    """
+    Counting proxy of a str haystack, which stays a str for the engines
+    that treat text and binary haystacks differently
+    """
+
+    def __new__(cls, data: str, counts: OperationCounts, field: str):
+        text = super().__new__(cls, data)
+        text._counts = vars(counts)
+        text._field = field
+        return text
+
+    def __getitem__(self, index):
+        value = str.__getitem__(self, index)
+        self._counts[self._field] += \
+            len(value) if isinstance(index, slice) else 1
+        return value
+
+    def __iter__(self):
+        counts, field = self._counts, self._field
+        for e in str.__iter__(self):
+            counts[field] += 1
+            yield e
+
+
+class _CountingMapping:
+    def __init__(self, data: dict, counts: OperationCounts, field: str):
+        self._data = data
+        self._counts = vars(counts)
+        self._field = field
+
+    def get(self, key, default=None):
+        self._counts[self._field] += 1
+        return self._data.get(key, default)
+
+    def __getitem__(self, key):
+        self._counts[self._field] += 1
+        return self._data[key]
+
+
+def _counting_haystack(haystack: Text, counts: OperationCounts):
+    if isinstance(haystack, str):
+        return _CountingStr(haystack, counts, 'comparisons')
+    return _CountingSequence(haystack, counts, 'comparisons')
+
+
+def _count_comparisons(haystack: Text, table, counts: OperationCounts):
+    return _counting_haystack(haystack, counts), table
+
+
+def _count_AC(haystack: Text, automaton: CompactAutomaton,
+              counts: OperationCounts):
+    automaton = copy.copy(automaton)
+    automaton.fail = _CountingSequence(automaton.fail, counts,
+                                       'failure_links')
+    automaton.output_link = _CountingSequence(automaton.output_link, counts,
+                                              'failure_links')
+    return _counting_haystack(haystack, counts), automaton
+
+
+_instrumented = {
+    brute_force: _count_comparisons,
+    KMP_algorithm: lambda h, pi, c: (
+        _counting_haystack(h, c),
+        _CountingSequence(pi, c, 'failure_links')),
+    hybrid_algorithm: lambda h, pi, c: (
+        _counting_haystack(h, c),
+        _CountingSequence(pi, c, 'failure_links')),
+    shift_or_algorithm: _count_comparisons,
+    z_function_finder: _count_comparisons,
+    BMH_algorithm: lambda h, d, c: (
+        _counting_haystack(h, c),
+        _CountingMapping(d, c, 'shifts')),
+    BM_algorithm: lambda h, t, c: (
+        _counting_haystack(h, c),
+        (_CountingMapping(t[0], c, 'shifts'),
+         _CountingSequence(t[1], c, 'shifts'))),
+    two_way_algorithm: _count_comparisons,
+    AC_algorithm: _count_AC,
+    RK_algorithm: _count_comparisons,
+}
+INSTRUMENTED_ENGINES = frozenset(_instrumented)
+
+
+class Matcher:
+    """
+    Needle compiled for one of the engines. The preprocessing table
+    is built once and reused by every search.
+    Besides str the haystack may be bytes, bytearray, memoryview or mmap.
+    Binary haystacks are searched without copying for the UTF-8 encoding
+    of a str needle, and the spans are byte offsets
+    """
+
+    def __init__(self, needle: Needles, engine: Callable = KMP_algorithm):
+        if engine not in _engines:
+            raise ValueError(f'Unknown engine: {engine}')
+        self._builder, self._scan = _engines[engine]
+        # Matchers are shared through the cache, so they must not see
+        # later changes of a mutable needle
+        if isinstance(needle, (bytearray, memoryview)):
+            needle = bytes(needle)
+        elif not isinstance(needle, (str, bytes)):
+            needle = tuple(needle)
+        self.needle = needle
+        self.engine = engine
+        self._single_needle = engine not in MULTI_NEEDLE_ENGINES
+        self._binary_only = not _is_text(needle)
+        self._empty = self._single_needle and len(needle) < 1
+        self._compiled = {}
+        self._compile(self._binary_only)
+
+    def find(self, haystack: Text) -> Union[tuple, int]:
+        if self._single_needle:
+            if len(haystack) < len(self.needle):
+                return -1
+            if len(self.needle) < 1:
+                return 0
+        return next(self.finditer(haystack), -1)
+
+    def finditer(self, haystack: Text,
+                 overlapping: bool = True) -> Iterator[tuple]:
+        if self._empty:
+            return _empty_needle_matches(haystack)
+        binary = not isinstance(haystack, str)
+        if self._binary_only and not binary:
+            raise TypeError("Can't search for a binary needle in str")
+        if binary:
+            haystack = _as_buffer(haystack)
+        needle, table = self._compiled.get(binary) or self._compile(binary)
+        if _counts is not None:
+            haystack, table = _instrumented[self.engine](haystack, table,
+                                                         _counts)
+        return self._scan(haystack, needle, table, overlapping)
+
+    def findall(self, haystack: Text, overlapping: bool = True) -> list[tuple]:
+        return list(self.finditer(haystack, overlapping))
+
+    def _compile(self, binary: bool) -> tuple:
+        needle = _encode_needle(self.needle) if binary else self.needle
+        table = None
+        if self._builder is not None and not self._empty:
+            table = _tables.get(self._builder, needle)
+        self._compiled[binary] = needle, table
+        return needle, table
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sum(_TableCache._measure(e)
+                                         for e in self._compiled.values())
+
+    def __repr__(self):
+        return f'Matcher({self.needle!r}, engine={self.engine.__name__})'
+
+
+_matcher_builders = {engine: functools.partial(Matcher, engine=engine)
+                     for engine in _engines}
+
+
+def _matcher(needle: Needles, engine: Callable) -> Matcher:
+    """
+    Matcher of the needle shared through the table cache, so that
+    searching millions of short documents for the same needle
+    does not compile it for each of them
+    """
+    builder = _matcher_builders.get(engine)
+    if builder is None:
+        raise ValueError(f'Unknown engine: {engine}')
+    return _tables.get(builder, needle)
+
+
+def compile(needle: Needles,
+            engine: Callable = KMP_algorithm) -> Matcher:
+    return Matcher(needle, engine)
+
+
+def finditer(haystack: Text, needle: Needles,
+             engine: Callable = KMP_algorithm,
+             overlapping: bool = True) -> Iterator[tuple]:
+    """
+    Lazily yields (start, end) of every occurrence of the needle found
+    by the engine in a single pass over the haystack.
+    With overlapping=False the search resumes after the end of each match
+    """
+    return _matcher(needle, engine).finditer(haystack, overlapping)
+
+
+def findall(haystack: Text, needle: Needles,
+            engine: Callable = KMP_algorithm,
+            overlapping: bool = True) -> list[tuple]:
+    return list(finditer(haystack, needle, engine, overlapping))
+
+
+def utf8_char_offset(data: Text, byte_offset: int) -> int:
+    """Number of characters encoded in the first byte_offset bytes"""
+    return utf8_char_spans(data, [(byte_offset, byte_offset)])[0][0]
+
+
+def utf8_char_spans(data: Text, spans: list[tuple]) -> list[tuple]:
+    """
+    Converts spans of byte offsets in UTF-8 data into spans of character
+    offsets. The data is read once in the order of the offsets
+    """
+    view = _as_buffer(data)
+    chars = {}
+    position = count = 0
+    for offset in sorted({e for span in spans for e in span}):
+        count += len(bytes(view[position:offset])
+                     .translate(None, _UTF8_CONTINUATION_BYTES))
+        chars[offset] = count
+        position = offset
+    return [tuple(chars[e] for e in span) for span in spans]
+
+
+if __name__ == '__main__':
+    from cli import main
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+from array import array
+from typing import Union, BinaryIO
+import struct
+import sys
+
+_MAGIC = b'SFSA'
+_VERSION = 2
+_HEADER = struct.Struct('<4sHQQ')
+
+
+class SuffixArray:
+    """
+    Name: Suffix array
+    Build time complexity: O(len(haystack) * log(len(haystack)) ** 2)
+    Query time complexity: O(len(needle) * log(len(haystack))),
+    plus O(occurrences) for find_all
+    Memory complexity: O(len(haystack))
+    Index of a fixed haystack that answers many queries without
+    rescanning it. Both ends of the range of suffixes starting with
+    the needle are found by binary search, each step comparing
+    len(needle) characters in one C-level slice comparison, and find
+    takes the leftmost start from a range minimum structure over sa,
+    which is built on the first call
+    """
+
+    def __init__(self, haystack: str, sa: array = None):
+        self.haystack = haystack
+        self.sa = build_suffix_array(haystack) if sa is None else sa
+        self._minimum = None
+
+    def find(self, needle: str) -> Union[tuple, int]:
+        if len(self.haystack) < len(needle):
+            return -1
+        if len(needle) < 1:
+            return 0
+        begin, end = self._range(needle)
+        if begin == end:
+            return -1
+        if self._minimum is None:
+            self._minimum = RangeMinimum(self.sa)
+        start = self._minimum.query(begin, end)
+        return start, start + len(needle)
+
+    def count(self, needle: str) -> int:
+        if len(needle) < 1:
+            return len(self.haystack) + 1
+        begin, end = self._range(needle)
+        return end - begin
+
+    def find_all(self, needle: str) -> list[tuple]:
+        if len(needle) < 1:
+            return [(i, i) for i in range(len(self.haystack) + 1)]
+        begin, end = self._range(needle)
+        return [(start, start + len(needle))
+                for start in sorted(self.sa[begin:end])]
+
+    def _range(self, needle: str) -> tuple[int, int]:
+        """Range of suffixes in sa which start with the needle"""
+        haystack, sa, m = self.haystack, self.sa, len(needle)
+        low, high = 0, len(sa)
+        while low < high:
+            middle = (low + high) // 2
+            if haystack[sa[middle]:sa[middle] + m] < needle:
+                low = middle + 1
+            else:
+                high = middle
+        begin, high = low, len(sa)
+        while low < high:
+            middle = (low + high) // 2
+            if haystack[sa[middle]:sa[middle] + m] <= needle:
+                low = middle + 1
+            else:
+                high = middle
+        return begin, low
+
+    def save(self, file: Union[str, BinaryIO]):
+        if isinstance(file, str):
+            with open(file, mode='wb') as f:
+                return self.save(f)
+        text = self.haystack.encode('utf-8')
+        file.write(_HEADER.pack(_MAGIC, _VERSION, len(text), len(self.sa)))
+        file.write(text)
+        file.write(_to_little_endian(self.sa).tobytes())
+
+    @classmethod
+    def load(cls, file: Union[str, BinaryIO]) -> 'SuffixArray':
+        if isinstance(file, str):
+            with open(file, mode='rb') as f:
+                return cls.load(f)
+        magic, version, text_size, length = \
+            _HEADER.unpack(file.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError('File does not contain a suffix array')
+        if version != _VERSION:
+            raise ValueError(f'Unsupported suffix array version: {version}')
+        haystack = file.read(text_size).decode('utf-8')
+        sa = _index_array()
+        sa.frombytes(file.read(length * sa.itemsize))
+        if len(sa) != length:
+            raise ValueError('Suffix array file is truncated')
+        return cls(haystack, _to_little_endian(sa))
+
+
+class RangeMinimum:
+    """
+    Minimum of values[begin:end] in O(block_size) time: a sparse table
+    over the minima of the blocks answers the whole blocks with two
+    lookups, and the partial blocks at both ends are scanned. Memory is
+    O(len(values) / block_size * log(len(values)))
+    """
+
+    def __init__(self, values: array, block_size: int = 32):
+        self.values = values
+        self.block_size = block_size
+        level = _index_array(min(values[i:i + block_size])
+                             for i in range(0, len(values), block_size))
+        # levels[k][i] is the minimum of the blocks i to i + 2 ** k - 1
+        self.levels = [level]
+        width = 1
+        while 2 * width <= len(self.levels[0]):
+            level = _index_array(map(min, level[:len(level) - width],
+                                     level[width:]))
+            self.levels.append(level)
+            width *= 2
+
+    def query(self, begin: int, end: int) -> int:
+        if begin >= end:
+            raise ValueError(f'Empty range: [{begin}, {end})')
+        size = self.block_size
+        first_block, last_block = -(-begin // size), end // size
+        if first_block >= last_block:
+            return min(self.values[begin:end])
+        minimum = []
+        if begin < first_block * size:
+            minimum.append(min(self.values[begin:first_block * size]))
+        if last_block * size < end:
+            minimum.append(min(self.values[last_block * size:end]))
+        k = (last_block - first_block).bit_length() - 1
+        level = self.levels[k]
+        minimum.append(min(level[first_block], level[last_block - (1 << k)]))
+        return min(minimum)
+
+
+def build_suffix_array(text: str) -> array:
+    """Prefix doubling: suffixes are sorted by their first 2^k characters"""
+    n = len(text)
+    rank = [ord(e) for e in text]
+    sa = sorted(range(n), key=rank.__getitem__)
+    k = 1
+    while n > 1:
+        shift = max(rank) + 2
+        key = [rank[i] * shift + (rank[i + k] + 1 if i + k < n else 0)
+               for i in range(n)]
+        sa.sort(key=key.__getitem__)
+        rank[sa[0]] = 0
+        for i in range(1, n):
+            rank[sa[i]] = rank[sa[i - 1]] + (key[sa[i]] != key[sa[i - 1]])
+        if rank[sa[-1]] == n - 1:
+            break
+        k *= 2
+    return _index_array(sa)
+
+
+def _index_array(values: list = ()) -> array:
+    return array('I' if array('I').itemsize == 4 else 'L', values)
+
+
+def _to_little_endian(values: array) -> array:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
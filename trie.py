@@ -1,11 +1,13 @@
 class Trie:
     def __init__(self, words: list = None):
         self._root = Node()
+        self._alphabet = set()
+        self._word_count = 0
         if words is not None:
             self.add(words)
 
     def add(self, words):
-        if isinstance(words, str):
+        if isinstance(words, (str, bytes)):
             self._add_word(words)
         elif hasattr(words, '__iter__'):
             for word in words:
@@ -15,6 +17,7 @@ class Trie:
 
     def _add_word(self, word: str):
         current_node = self._root
+        self._alphabet.update(word)
         for char in word:
             child = current_node.children.get(char)
             if child is None:
@@ -22,27 +25,23 @@ class Trie:
                 current_node = current_node.children[char]
             else:
                 current_node = child
-        current_node.is_terminal = True
+        current_node.word_ids += (self._word_count,)
+        self._word_count += 1
 
     @property
     def root(self):
         return self._root
 
+    @property
+    def alphabet(self):
+        return self._alphabet
+
+    @property
+    def word_count(self):
+        return self._word_count
+
 
 class Node:
     def __init__(self):
-        self.is_terminal = False
+        self.word_ids = ()
         self.children = {}
-        self.suffix = None
-
-    def find_suffix(self, root, parent, char):
-        if self is root:
-            return
-        v = parent.suffix
-        while v is not None:
-            child = v.children.get(char)
-            if child is not None:
-                self.suffix = child
-                return
-            v = v.suffix
-        self.suffix = root
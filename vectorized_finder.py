@@ -0,0 +1,104 @@
+from substring_finder import Text
+from typing import Union, Iterator
+import numpy as np
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+INITIAL_BLOCK_SIZE = 1 << 12
+
+
+def vectorized_finder(haystack: Text,
+                      needle: Union[str, bytes]) -> Union[tuple, int]:
+    """
+    Name: Vectorized candidate filtering
+    Time complexity: O(len(haystack) * len(needle))
+    Memory complexity: O(len(needle))
+    The haystack is mapped to NumPy arrays of character codes block by
+    block. Candidate positions are found with vectorized comparisons
+    against the rarest, the first and the last characters of the needle,
+    and the rest of the needle is compared only at surviving candidates
+    """
+    if len(haystack) < len(needle):
+        return -1
+    if len(needle) < 1:
+        return 0
+    return next(vectorized_finditer(haystack, needle), -1)
+
+
+def vectorized_finditer(haystack: Text, needle: Union[str, bytes],
+                        overlapping: bool = True,
+                        block_size: int = DEFAULT_BLOCK_SIZE) \
+        -> Iterator[tuple]:
+    """
+    Blocks start small, so that an early first match is cheap, and double
+    up to block_size positions, which bounds the memory of the masks.
+    Like Matcher, a binary haystack is searched for the UTF-8 encoding
+    of a str needle and the spans are byte offsets
+    """
+    if isinstance(haystack, str):
+        if not isinstance(needle, str):
+            raise TypeError("Can't search for a binary needle in str")
+    elif isinstance(needle, str):
+        needle = needle.encode('utf-8')
+    needle_codes = to_codes(needle)
+    m = len(needle_codes)
+    if m < 1:
+        yield from ((i, i) for i in range(len(haystack) + 1))
+        return
+    positions = len(haystack) - m + 1
+    order = None
+    next_start = 0
+    block_start = 0
+    size = min(INITIAL_BLOCK_SIZE, block_size)
+    while block_start < positions:
+        block_stop = min(block_start + size, positions)
+        codes = to_codes(haystack[block_start:block_stop + m - 1]
+                         if isinstance(haystack, str) else
+                         memoryview(haystack)[block_start:block_stop + m - 1])
+        if order is None:
+            order = _comparison_order(codes, needle_codes)
+        for start in _block_matches(codes, needle_codes, order):
+            start += block_start
+            if start >= next_start:
+                yield start, start + m
+                if not overlapping:
+                    next_start = start + m
+        block_start = block_stop
+        size = min(size * 2, block_size)
+
+
+def to_codes(text: Text) -> np.ndarray:
+    """Character codes of a str, or the bytes of binary data without copy"""
+    if isinstance(text, str):
+        return np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+    return np.frombuffer(text, dtype=np.uint8)
+
+
+def _comparison_order(codes: np.ndarray, needle_codes: np.ndarray) -> list:
+    """
+    Needle positions in the order they are compared: the rarest, the first
+    and the last characters of the needle go first, because they remove
+    the most candidates. Frequencies are estimated on the first block
+    """
+    needle_codes = needle_codes.tolist()
+    frequency = {e: int(np.count_nonzero(codes == e))
+                 for e in set(needle_codes)}
+    rarest = min(range(len(needle_codes)),
+                 key=lambda i: frequency[needle_codes[i]])
+    order = list(dict.fromkeys([rarest, 0, len(needle_codes) - 1]))
+    order.extend(i for i in range(len(needle_codes)) if i not in order)
+    return order
+
+
+def _block_matches(codes: np.ndarray, needle_codes: np.ndarray,
+                   order: list) -> list:
+    positions = len(codes) - len(needle_codes) + 1
+    mask = None
+    for i in order[:3]:
+        equal = codes[i:positions + i] == needle_codes[i]
+        mask = equal if mask is None else mask & equal
+    candidates = np.flatnonzero(mask)
+    for i in order[3:]:
+        if len(candidates) == 0:
+            break
+        candidates = candidates[codes[candidates + i] == needle_codes[i]]
+    return candidates.tolist()